@@ -1,14 +1,25 @@
-import json
-import requests
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from jose import jwt, JWTError
-from django.core.cache import cache
+from .jwks import get_jwks_store
+from .token_cache import VerifiedTokenCache
+from .user_cache import ProfileSync, user_cache
 
 User = get_user_model()
 
+# Verified payloads shared by every Auth0Authentication instance in this process
+token_cache = VerifiedTokenCache(
+    maxsize=settings.JWT_SETTINGS.get('TOKEN_CACHE_SIZE', 1024)
+)
+
+# Coalesced background writes of Auth0 profile claim changes
+profile_sync = ProfileSync(
+    User, interval=settings.JWT_SETTINGS.get('PROFILE_SYNC_INTERVAL', 2.0)
+)
+
 def get_client_ip(request):
     """
     Get the client's IP address from the request
@@ -89,28 +100,17 @@ class Auth0Authentication(BaseAuthentication):
         """
         Fetch Auth0's public keys for token validation
         """
-        # Check cache first
-        jwks = cache.get('auth0_jwks')
-        if jwks:
-            return jwks
-        
-        try:
-            jwks_url = settings.JWT_SETTINGS['JWKS_URL']
-            response = requests.get(jwks_url, timeout=10)
-            response.raise_for_status()
-            jwks = response.json()
-            
-            # Cache for 1 hour
-            cache.set('auth0_jwks', jwks, 3600)
-            return jwks
-            
-        except requests.RequestException as e:
-            raise AuthenticationFailed(f'Unable to fetch JWKS: {str(e)}')
+        return get_jwks_store().get_jwks()
     
     def validate_token(self, token):
         """
         Validate JWT token signature and claims
         """
+        # Tokens verified earlier skip header parsing and signature checks
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
+
         try:
             # Get the key ID from token header
             unverified_header = jwt.get_unverified_header(token)
@@ -119,21 +119,8 @@ class Auth0Authentication(BaseAuthentication):
             if not kid:
                 raise AuthenticationFailed('Token header missing key ID')
             
-            # Get JWKS
-            jwks = self.get_jwks()
-            
-            # Find the correct key
-            rsa_key = None
-            for key in jwks['keys']:
-                if key['kid'] == kid:
-                    rsa_key = {
-                        'kty': key['kty'],
-                        'kid': key['kid'],
-                        'use': key['use'],
-                        'n': key['n'],
-                        'e': key['e']
-                    }
-                    break
+            # Look up the pre-built key for this kid
+            rsa_key = get_jwks_store().get_key(kid)
             
             if not rsa_key:
                 raise AuthenticationFailed('Unable to find appropriate key')
@@ -147,6 +134,7 @@ class Auth0Authentication(BaseAuthentication):
                 issuer=settings.JWT_SETTINGS['ISSUER']
             )
             
+            token_cache.set(token, payload)
             return payload
             
         except JWTError as e:
@@ -174,6 +162,12 @@ class Auth0Authentication(BaseAuthentication):
             if not email:
                 raise AuthenticationFailed('Token missing email - check Auth0 configuration')
             
+            # Resolved recently: no queries, drift is written in the background
+            user = user_cache.get(auth0_id)
+            if user is not None:
+                self.sync_profile(user, email, name, picture)
+                return user
+            
             # Get client IP and determine role
             client_ip = get_client_ip(request)
             role = 'owner' if is_owner_ip(client_ip) else 'customer'
@@ -183,22 +177,11 @@ class Auth0Authentication(BaseAuthentication):
                 user = User.objects.get(auth0_id=auth0_id)
                 
                 # Update user information if it has changed
-                updated = False
-                if user.email != email:
-                    user.email = email
-                    updated = True
-                if user.name != name:
-                    user.name = name
-                    updated = True
-                if user.profile_picture != picture:
-                    user.profile_picture = picture
-                    updated = True
                 # NOTE: Role is NOT updated for existing users
                 # Role is set only once during user creation
+                self.sync_profile(user, email, name, picture)
                 
-                if updated:
-                    user.save()
-                
+                user_cache.set(auth0_id, user)
                 return user
                 
             except User.DoesNotExist:
@@ -211,6 +194,7 @@ class Auth0Authentication(BaseAuthentication):
                     user.profile_picture = picture
                     user.role = role  # Set role based on IP
                     user.save()
+                    user_cache.set(auth0_id, user)
                     return user
                     
                 except User.DoesNotExist:
@@ -223,11 +207,33 @@ class Auth0Authentication(BaseAuthentication):
                         role=role,  # Set role based on IP
                         is_active=True,
                     )
+                    user_cache.set(auth0_id, user)
                     return user
                     
         except Exception as e:
             raise AuthenticationFailed(f'User creation failed: {str(e)}')
     
+    def sync_profile(self, user, email, name, picture):
+        """
+        Queue a write for profile claims that changed in Auth0
+        """
+        changes = {}
+        if user.email != email:
+            changes['email'] = email
+        if user.name != name:
+            changes['name'] = name
+        if user.profile_picture != picture:
+            changes['profile_picture'] = picture
+        
+        if changes:
+            for field, value in changes.items():
+                setattr(user, field, value)
+            # Profile ETags are derived from updated_at
+            user.updated_at = timezone.now()
+            # Keep the cached copy current so the drift is only queued once
+            user_cache.set(user.auth0_id, user)
+            profile_sync.enqueue(user.pk, changes)
+    
     def authenticate_header(self, request):
         """
         Return the authentication header that should be used for unauthenticated responses
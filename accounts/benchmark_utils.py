@@ -0,0 +1,117 @@
+"""
+Helpers for generating keys and tokens locally, used by the auth benchmarks
+"""
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from jose import jwt
+
+
+def _b64(number):
+    data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def generate_rsa_key(kid=None, bits=2048):
+    """
+    Generate an RSA keypair and return (private key PEM, public JWK)
+    """
+    kid = kid or uuid.uuid4().hex
+    public_key, private_key = rsa.newkeys(bits)
+    jwk = {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': _b64(public_key.n),
+        'e': _b64(public_key.e),
+    }
+    return private_key.save_pkcs1().decode('ascii'), jwk
+
+
+def mint_token(private_pem, kid, audience, issuer, lifetime=3600, **claims):
+    """
+    Sign an RS256 access token shaped like the ones Auth0 issues
+    """
+    now = int(time.time())
+    payload = {
+        'sub': f'auth0|{uuid.uuid4().hex}',
+        'aud': audience,
+        'iss': issuer,
+        'iat': now,
+        'exp': now + lifetime,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, private_pem, algorithm='RS256', headers={'kid': kid})
+
+
+class JWKSStandIn:
+    """
+    In-process HTTP server that serves a JWKS document in place of Auth0.
+
+    ``latency`` (seconds) is added to every response and ``failure_rate``
+    (0..1) of requests are answered with a 503, so refresh behaviour can be
+    measured under a slow or flaky identity provider. Use as a context
+    manager; ``url`` is only valid while it is running.
+    """
+
+    def __init__(self, jwks, latency=0.0, failure_rate=0.0, seed=None):
+        self.jwks = jwks
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/.well-known/jwks.json'
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests += 1
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                if stand_in._random.random() < stand_in.failure_rate:
+                    stand_in.failures += 1
+                    self.send_error(503)
+                    return
+                body = json.dumps(stand_in.jwks).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,209 @@
+import json
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+
+from .jwt_backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Shared cache entry so workers reuse each other's fetches when the
+# configured cache backend is shared (database, redis, memcached...)
+CACHE_KEY = 'auth0_jwks_store'
+
+
+class JWKSStore:
+    """
+    Auth0 signing keys indexed by ``kid`` and pre-built into key objects.
+
+    Keys older than ``ttl`` are still served while a single background thread
+    refreshes them (stale-while-revalidate). Keys older than ``max_stale`` are
+    refreshed synchronously, and concurrent callers share that one fetch.
+    Keys loaded from a pinned JWKS file never hard-expire, so a worker can
+    authenticate before it has ever reached the network.
+    """
+
+    def __init__(self, url, algorithm='RS256', ttl=3600, max_stale=86400,
+                 min_refresh_interval=30, timeout=10, pinned_file=None, backend=None):
+        self.url = url
+        self.algorithm = algorithm
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.backend = backend or get_backend()
+
+        self._jwks = None
+        self._keys = {}
+        self._fetched_at = None
+        self._pinned = False
+        self._last_attempt = 0.0
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._inflight = None
+
+        if pinned_file:
+            self.load_file(pinned_file)
+
+    def build_key(self, key_data):
+        """
+        Construct a verification key object from a single JWK
+        """
+        return self.backend.construct_key(key_data, key_data.get('alg', self.algorithm))
+
+    def load(self, jwks, fetched_at=None):
+        """
+        Index a JWKS document by kid and swap it in atomically
+        """
+        keys = {}
+        for key_data in jwks.get('keys', []):
+            kid = key_data.get('kid')
+            if not kid or key_data.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[kid] = self.build_key(key_data)
+            except Exception as e:
+                logger.warning('Skipping unusable JWK %s: %s', kid, e)
+
+        with self._lock:
+            self._jwks = jwks
+            self._keys = keys
+            self._fetched_at = fetched_at
+            self._pinned = fetched_at is None
+
+    def load_file(self, path):
+        """
+        Seed the store from a pinned JWKS file
+        """
+        with open(path) as f:
+            self.load(json.load(f))
+
+    def get_jwks(self):
+        """
+        Return the raw JWKS document, fetching it if nothing is loaded yet
+        """
+        self._ensure_loaded()
+        return self._jwks
+
+    def get_key(self, kid):
+        """
+        Return the pre-built key for a kid, or None if Auth0 doesn't know it
+        """
+        self._ensure_loaded()
+        key = self._keys.get(kid)
+        if key is None and time.time() - self._last_attempt >= self.min_refresh_interval:
+            # Possibly a freshly rotated key; rate limited so unknown kids
+            # can't be used to hammer Auth0
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    def _age(self):
+        if self._fetched_at is None:
+            return None
+        return time.time() - self._fetched_at
+
+    def _ensure_loaded(self):
+        if not self._keys:
+            self.refresh()
+            if not self._keys:
+                raise AuthenticationFailed(f'Unable to fetch JWKS: {self._last_error}')
+            return
+
+        age = self._age()
+        if not self._pinned and age < self.ttl:
+            return
+        if time.time() - self._last_attempt < self.min_refresh_interval:
+            # Keep serving current keys while Auth0 is unreachable
+            return
+        if not self._pinned and age >= self.max_stale:
+            self.refresh()
+        else:
+            self.refresh(wait=False)
+
+    def refresh(self, wait=True):
+        """
+        Refresh the keys, collapsing concurrent callers into one fetch.
+
+        With ``wait=False`` the fetch happens on a background thread and the
+        caller keeps using the current keys.
+        """
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+        if leader:
+            if wait:
+                self._run_refresh(event)
+            else:
+                threading.Thread(target=self._run_refresh, args=(event,), daemon=True).start()
+        elif wait:
+            event.wait(self.timeout + 1)
+
+    def _run_refresh(self, event):
+        try:
+            self._fetch()
+            self._last_error = None
+        except Exception as e:
+            self._last_error = e
+            logger.warning('JWKS refresh failed: %s', e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def _fetch(self):
+        shared = cache.get(CACHE_KEY)
+        if shared and shared['fetched_at'] > (self._fetched_at or 0) \
+                and time.time() - shared['fetched_at'] < self.ttl:
+            self.load(shared['jwks'], shared['fetched_at'])
+            return
+
+        self._last_attempt = time.time()
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        jwks = response.json()
+
+        fetched_at = time.time()
+        self.load(jwks, fetched_at)
+        cache.set(CACHE_KEY, {'jwks': jwks, 'fetched_at': fetched_at}, self.max_stale)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_jwks_store():
+    """
+    Return the process-wide JWKS store, creating it from JWT_SETTINGS
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                jwt_settings = settings.JWT_SETTINGS
+                _store = JWKSStore(
+                    jwt_settings['JWKS_URL'],
+                    algorithm=jwt_settings['ALGORITHM'],
+                    ttl=jwt_settings.get('JWKS_CACHE_TTL', 3600),
+                    max_stale=jwt_settings.get('JWKS_MAX_STALE', 86400),
+                    pinned_file=jwt_settings.get('JWKS_FILE'),
+                    backend=get_backend(jwt_settings.get('VERIFY_BACKEND', 'auto')),
+                )
+    return _store
+
+
+def reset_jwks_store():
+    """
+    Drop the process-wide store so the next call rebuilds it from settings
+    """
+    global _store
+    with _store_lock:
+        _store = None
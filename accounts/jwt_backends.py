@@ -0,0 +1,79 @@
+"""
+Pluggable signature verification backends for Auth0 tokens.
+
+python-jose ships key implementations backed by the pure-Python ``rsa``
+package and by the native ``cryptography`` package. Keys built by a backend
+are handed to ``jwt.decode`` directly, so claim validation is identical and
+only the signature check changes.
+"""
+from django.conf import settings
+from jose.backends.rsa_backend import RSAKey as PythonRSAKey
+
+try:
+    from jose.backends.cryptography_backend import CryptographyRSAKey
+except ImportError:  # cryptography is optional
+    CryptographyRSAKey = None
+
+
+class VerificationBackend:
+    """
+    Builds verification keys from JWKs with a specific crypto implementation
+    """
+    name = None
+    key_class = None
+
+    @classmethod
+    def is_available(cls):
+        return cls.key_class is not None
+
+    def construct_key(self, key_data, algorithm):
+        return self.key_class(key_data, algorithm)
+
+
+class CryptographyBackend(VerificationBackend):
+    """
+    OpenSSL-backed verification through the ``cryptography`` package
+    """
+    name = 'cryptography'
+    key_class = CryptographyRSAKey
+
+
+class PythonRSABackend(VerificationBackend):
+    """
+    Pure-Python verification through the ``rsa`` package
+    """
+    name = 'python-rsa'
+    key_class = PythonRSAKey
+
+
+# In order of preference for 'auto'
+BACKENDS = {
+    backend.name: backend
+    for backend in (CryptographyBackend, PythonRSABackend)
+}
+
+
+def available_backends():
+    """
+    Return the names of the backends that can run in this environment
+    """
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name=None):
+    """
+    Return a backend instance by name, or the fastest available for 'auto'
+    """
+    if name is None:
+        name = settings.JWT_SETTINGS.get('VERIFY_BACKEND', 'auto')
+
+    if name == 'auto':
+        return BACKENDS[available_backends()[0]]()
+
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JWT verification backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if not backend.is_available():
+        raise ValueError(f"JWT verification backend '{name}' is not installed")
+    return backend()
@@ -0,0 +1,179 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from jose import jwt
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts import jwks
+from accounts.authentication import Auth0Authentication, token_cache
+from accounts.benchmark_utils import JWKSStandIn, generate_rsa_key, mint_token
+from accounts.jwt_backends import get_backend
+from accounts.user_cache import user_cache
+
+STAGES = ['header parse', 'jwks lookup', 'decode', 'user resolution']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark Auth0Authentication offline: keys and tokens are generated '
+        'locally and JWKS is served by an in-process stand-in. Database writes '
+        'are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Authenticated requests to simulate (default: 1000)')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Distinct users/tokens in the mix (default: 20)')
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Milliseconds added to every JWKS response (default: 0)')
+        parser.add_argument('--failure-rate', type=float, default=0.0,
+                            help='Fraction of JWKS requests answered with a 503 (default: 0)')
+        parser.add_argument('--jwks-ttl', type=int, default=3600,
+                            help='Seconds before the JWKS store revalidates (default: 3600)')
+        parser.add_argument('--backend', default='auto',
+                            help="JWT verification backend (default: 'auto')")
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Seed for injected failures')
+
+    def handle(self, *args, **options):
+        self.failed = 0
+        private_pem, jwk = generate_rsa_key(kid='bench')
+        audience, issuer = 'https://bench.local/api', 'https://bench.local/'
+
+        with JWKSStandIn({'keys': [jwk]}, latency=options['latency'] / 1000,
+                         failure_rate=options['failure_rate'], seed=options['seed']) as stand_in:
+            jwt_settings = dict(
+                settings.JWT_SETTINGS,
+                JWKS_URL=stand_in.url,
+                JWKS_FILE=None,
+                JWKS_CACHE_TTL=options['jwks_ttl'],
+                AUDIENCE=audience,
+                ISSUER=issuer,
+                VERIFY_BACKEND=options['backend'],
+            )
+            with override_settings(JWT_SETTINGS=jwt_settings):
+                self._reset()
+                try:
+                    with transaction.atomic():
+                        tokens = [
+                            mint_token(private_pem, jwk['kid'], audience, issuer,
+                                       sub=f'auth0|bench-{i}', email=f'bench-{i}@bench.local',
+                                       name=f'Bench User {i}')
+                            for i in range(options['users'])
+                        ]
+                        stages = self._measure_stages(tokens, options['requests'])
+                        end_to_end = self._measure_end_to_end(tokens, options['requests'])
+                        transaction.set_rollback(True)
+                finally:
+                    self._reset()
+
+            self.stdout.write(
+                f"{options['requests']} requests, {options['users']} users, "
+                f"backend={get_backend(options['backend']).name}, "
+                f"JWKS latency={options['latency']}ms failure rate={options['failure_rate']}"
+            )
+            self.stdout.write(
+                f'JWKS stand-in served {stand_in.requests} requests, {stand_in.failures} failed; '
+                f'{self.failed} authentications failed\n'
+            )
+
+        self._report('Per stage, caches bypassed (ms)', stages)
+        self._report('End to end through authenticate() (ms)', end_to_end)
+
+    def _reset(self):
+        jwks.reset_jwks_store()
+        cache.delete(jwks.CACHE_KEY)
+        token_cache.clear()
+        user_cache.clear()
+
+    def _measure_stages(self, tokens, count):
+        """
+        Time each step validate_token/get_or_create_user perform, uncached
+        """
+        factory = RequestFactory()
+        auth = Auth0Authentication()
+        jwt_settings = settings.JWT_SETTINGS
+        timings = {stage: [] for stage in STAGES}
+
+        for i in range(count):
+            header = f'Bearer {tokens[i % len(tokens)]}'
+            request = factory.get('/api/profile/', HTTP_AUTHORIZATION=header)
+
+            start = time.perf_counter()
+            _, token = request.META['HTTP_AUTHORIZATION'].split(' ', 1)
+            kid = jwt.get_unverified_header(token)['kid']
+            parsed = time.perf_counter()
+            try:
+                key = jwks.get_jwks_store().get_key(kid)
+            except AuthenticationFailed:
+                # No keys yet and the stand-in failed the fetch
+                self.failed += 1
+                continue
+            looked_up = time.perf_counter()
+            payload = jwt.decode(
+                token, key,
+                algorithms=[jwt_settings['ALGORITHM']],
+                audience=jwt_settings['AUDIENCE'],
+                issuer=jwt_settings['ISSUER'],
+            )
+            decoded = time.perf_counter()
+            user_cache.clear()
+            auth.get_or_create_user(payload, request)
+            resolved = time.perf_counter()
+
+            timings['header parse'].append(parsed - start)
+            timings['jwks lookup'].append(looked_up - parsed)
+            timings['decode'].append(decoded - looked_up)
+            timings['user resolution'].append(resolved - decoded)
+        return timings
+
+    def _measure_end_to_end(self, tokens, count):
+        """
+        Time authenticate() with the token and user caches warming up naturally
+        """
+        factory = RequestFactory()
+        auth = Auth0Authentication()
+        token_cache.clear()
+        user_cache.clear()
+        cold, warm = [], []
+        seen = set()
+
+        for i in range(count):
+            token = tokens[i % len(tokens)]
+            request = factory.get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {token}')
+            start = time.perf_counter()
+            try:
+                auth.authenticate(request)
+            except AuthenticationFailed:
+                self.failed += 1
+                continue
+            elapsed = time.perf_counter() - start
+            (warm if token in seen else cold).append(elapsed)
+            seen.add(token)
+        return {'first sight': cold, 'repeat': warm}
+
+    def _report(self, title, timings):
+        self.stdout.write(title)
+        self.stdout.write(f"  {'stage':<16}{'n':>7}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for stage, samples in timings.items():
+            if not samples:
+                continue
+            ms = sorted(s * 1000 for s in samples)
+            self.stdout.write(
+                f'  {stage:<16}{len(ms):>7}{statistics.fmean(ms):>10.3f}'
+                f'{self._percentile(ms, 50):>10.3f}{self._percentile(ms, 90):>10.3f}'
+                f'{self._percentile(ms, 99):>10.3f}{ms[-1]:>10.3f}'
+            )
+        self.stdout.write('')
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+        return ordered[index]
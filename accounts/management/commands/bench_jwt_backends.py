@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from jose import jwt
+
+from accounts.benchmark_utils import generate_rsa_key, mint_token
+from accounts.jwt_backends import available_backends, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Measure RS256 verifications per second for each available JWT backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500,
+                            help='Verifications per backend (default: 500)')
+        parser.add_argument('--bits', type=int, default=2048,
+                            help='RSA key size (default: 2048)')
+
+    def handle(self, *args, **options):
+        audience, issuer = 'https://bench.local/api', 'https://bench.local/'
+        private_pem, jwk = generate_rsa_key(kid='bench', bits=options['bits'])
+        token = mint_token(private_pem, jwk['kid'], audience, issuer)
+
+        self.stdout.write(f"RS256, {options['bits']}-bit key, {options['iterations']} verifications\n")
+        for name in available_backends():
+            key = get_backend(name).construct_key(jwk, 'RS256')
+            start = time.perf_counter()
+            for _ in range(options['iterations']):
+                jwt.decode(token, key, algorithms=['RS256'], audience=audience, issuer=issuer)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:<14} {options['iterations'] / elapsed:>10.0f} verifications/s  "
+                f"({elapsed / options['iterations'] * 1e6:.1f} us each)"
+            )
@@ -2,7 +2,10 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from accounts.managers import CustomUserManager
+from accounts.user_cache import bump_user_version, user_cache
 # Create your models here.
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
@@ -36,4 +39,12 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
 
     def get_full_name(self):
-        return self.name if self.name else self.email
\ No newline at end of file
+        return self.name if self.name else self.email
+
+
+# Drop cached authentication lookups whenever a user row changes, here and
+# (through the shared version) on every other worker
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance)
+    bump_user_version(instance.pk)
@@ -1,3 +1,260 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .jwks import JWKSStore
+from .token_cache import VerifiedTokenCache
+from .user_cache import ProfileSync, UserCache
+
+User = get_user_model()
+
+# Visible to every process on the host, unlike the LocMemCache default
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'sj-backend-test-cache'),
+}}
+
+
+class UserCacheTests(TestCase):
+    """
+    Cached users are private copies, expire, and go stale on any write
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(auth0_id='auth0|1', email='one@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.cache = UserCache(maxsize=2, ttl=60)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get('auth0|1'))
+        self.cache.set('auth0|1', self.user)
+        cached = self.cache.get('auth0|1')
+        self.assertEqual(cached.pk, self.user.pk)
+        self.assertIsNot(cached, self.cache.get('auth0|1'))
+        self.assertEqual(self.cache.stats(), {'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 2})
+
+    def test_ttl_expiry(self):
+        with mock.patch('accounts.user_cache.time.monotonic', return_value=1000.0):
+            self.cache.set('auth0|1', self.user)
+        with mock.patch('accounts.user_cache.time.monotonic', return_value=1059.0):
+            self.assertIsNotNone(self.cache.get('auth0|1'))
+        with mock.patch('accounts.user_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(self.cache.get('auth0|1'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_save_invalidates(self):
+        from .user_cache import user_cache
+        user_cache.set('auth0|1', self.user)
+        User.objects.get(pk=self.user.pk).save()
+        self.assertIsNone(user_cache.get('auth0|1'))
+
+    def test_write_on_another_worker_local_cache(self):
+        # No shared cache: hits re-read updated_at/is_active from the row
+        self.cache.set('auth0|1', self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False, updated_at=timezone.now())
+        self.assertIsNone(self.cache.get('auth0|1'))
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_write_on_another_worker_shared_cache(self):
+        cache.clear()
+        other_worker = UserCache(maxsize=2, ttl=60)
+        other_worker.set('auth0|1', self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNotNone(other_worker.get('auth0|1'))
+        self.assertEqual(len(queries), 0)
+
+        # Saved here; the receiver bumps the shared version
+        user = User.objects.get(pk=self.user.pk)
+        user.role = 'owner'
+        user.save()
+        self.assertIsNone(other_worker.get('auth0|1'))
+
+    def test_deleted_user_is_dropped(self):
+        self.cache.set('auth0|1', self.user)
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertIsNone(self.cache.get('auth0|1'))
+
+
+@mock.patch.object(ProfileSync, '_run', lambda self: None)
+class ProfileSyncTests(TestCase):
+    """
+    Profile claim drift is coalesced per user into one UPDATE
+    """
+
+    def test_coalesced_update(self):
+        user = User.objects.create(auth0_id='auth0|2', email='two@example.com', name='Old')
+        sync = ProfileSync(User, interval=0)
+        sync.enqueue(user.pk, {'name': 'New'})
+        sync.enqueue(user.pk, {'email': 'new@example.com'})
+        sync.enqueue(user.pk, {'name': 'Newest'})
+        self.assertEqual(sync.pending_count(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sync.flush(), 1)
+        self.assertEqual([q['sql'].split()[0] for q in queries], ['UPDATE'])
+        self.assertEqual(sync.pending_count(), 0)
+        user.refresh_from_db()
+        self.assertEqual((user.name, user.email), ('Newest', 'new@example.com'))
+
+
+class VerifiedTokenCacheTests(TestCase):
+    """
+    Verified payloads are cached by token digest until the token expires
+    """
+
+    def setUp(self):
+        self.cache = VerifiedTokenCache(maxsize=2)
+        self.now = time.time()
+
+    def test_expired_token_is_never_served(self):
+        self.cache.set('short', {'sub': 'a', 'exp': self.now + 10})
+        self.cache.set('expired', {'sub': 'b', 'exp': self.now - 1})
+        self.cache.set('no-exp', {'sub': 'c'})
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get('short'), {'sub': 'a', 'exp': self.now + 10})
+        with mock.patch('accounts.token_cache.time.time', return_value=self.now + 10):
+            self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        for token in ('one', 'two'):
+            self.cache.set(token, {'sub': token, 'exp': self.now + 60})
+        self.cache.get('one')
+        self.cache.set('three', {'sub': 'three', 'exp': self.now + 60})
+        self.assertIsNone(self.cache.get('two'))
+        self.assertIsNotNone(self.cache.get('one'))
+        self.assertIsNotNone(self.cache.get('three'))
+        self.assertEqual(len(self.cache), 2)
+
+    def test_counters(self):
+        self.cache.set('one', {'sub': 'one', 'exp': self.now + 60})
+        self.cache.get('one')
+        self.cache.get('one')
+        self.cache.get('unknown')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size'], stats['maxsize']), (2, 1, 1, 2))
+        self.assertAlmostEqual(stats['hit_ratio'], 2 / 3)
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    def test_raw_token_is_not_stored(self):
+        token = 'eyJhbGciOiJSUzI1NiJ9.payload.signature'
+        self.cache.set(token, {'sub': 'a', 'exp': self.now + 60})
+        self.assertEqual(list(self.cache._entries), [hashlib.sha256(token.encode('utf-8')).digest()])
+        self.assertNotIn(token, repr(self.cache._entries))
+
+
+class FakeBackend:
+    def construct_key(self, key_data, algorithm):
+        return f"key:{key_data['kid']}"
+
+
+def jwks_response(*kids):
+    response = mock.Mock()
+    response.json.return_value = {'keys': [{'kid': kid, 'kty': 'RSA', 'use': 'sig'} for kid in kids]}
+    return response
+
+
+class JWKSStoreTests(TestCase):
+    """
+    Signing keys are fetched once, refreshed without blocking, and rate limited
+    """
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('accounts.jwks.requests.get')
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store(self, **kwargs):
+        return JWKSStore('https://tenant.example/.well-known/jwks.json', ttl=60, max_stale=600,
+                         backend=FakeBackend(), **kwargs)
+
+    def wait_for_refresh(self, store):
+        deadline = time.monotonic() + 5
+        while store._inflight is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(store._inflight)
+
+    def test_single_flight_fetch(self):
+        release = threading.Event()
+
+        def slow_fetch(url, timeout):
+            release.wait(5)
+            return jwks_response('k1')
+        self.fetch.side_effect = slow_fetch
+        store = self.store()
+        keys = []
+        threads = [threading.Thread(target=lambda: keys.append(store.get_key('k1'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(keys, ['key:k1'] * 5)
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_stale_keys_served_while_refreshing(self):
+        store = self.store()
+        store.load(jwks_response('old').json(), fetched_at=time.time() - 61)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_fetch(url, timeout):
+            started.set()
+            release.wait(5)
+            return jwks_response('new')
+        self.fetch.side_effect = slow_fetch
+        self.assertEqual(store.get_key('old'), 'key:old')
+        self.assertTrue(started.wait(5))
+        release.set()
+        self.wait_for_refresh(store)
+        self.assertEqual(store.get_key('new'), 'key:new')
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_refresh_is_synchronous_past_max_stale(self):
+        store = self.store()
+        store.load(jwks_response('old').json(), fetched_at=time.time() - 601)
+        self.fetch.return_value = jwks_response('new')
+        self.assertIsNone(store.get_key('old'))
+        self.assertEqual(store.get_key('new'), 'key:new')
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_seeded_from_file(self):
+        self.fetch.side_effect = ConnectionError('offline')
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(jwks_response('pinned').json(), f)
+        self.addCleanup(os.unlink, f.name)
+        store = self.store(pinned_file=f.name)
+        self.assertEqual(store.get_key('pinned'), 'key:pinned')
+        self.wait_for_refresh(store)
+        # The failed background refresh leaves the pinned keys in place
+        self.assertEqual(store.get_key('pinned'), 'key:pinned')
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        store = self.store(min_refresh_interval=30)
+        self.fetch.return_value = jwks_response('k1')
+        self.assertEqual(store.get_key('k1'), 'key:k1')
+        self.assertIsNone(store.get_key('rotated'))
+        self.assertIsNone(store.get_key('rotated'))
+        self.assertEqual(self.fetch.call_count, 1)
+
+        self.fetch.return_value = jwks_response('k1', 'rotated')
+        cache.clear()
+        with mock.patch('accounts.jwks.time.time', return_value=time.time() + 31):
+            self.assertEqual(store.get_key('rotated'), 'key:rotated')
+        self.assertEqual(self.fetch.call_count, 2)
@@ -0,0 +1,205 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from api.caching import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'auth:user:version:{}'
+
+
+def get_user_version(pk):
+    """
+    Return the user's version in the shared cache
+    """
+    key = VERSION_KEY.format(pk)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a flushed cache never reuses old numbers
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(pk):
+    """
+    Make every worker's cached copy of the user stale
+    """
+    cache.set(VERSION_KEY.format(pk), time.time_ns(), None)
+
+
+class UserCache:
+    """
+    Bounded in-process LRU cache of resolved users keyed by Auth0 ``sub``.
+
+    Each entry remembers the user's version when it was cached, and a hit
+    is only served while that version is still current, so a save or delete
+    on any worker (see the signal receivers in accounts.models) takes effect
+    on the next request everywhere. With a shared cache backend the version
+    is a counter bumped by those receivers; with a per-process one it is the
+    row's ``updated_at`` and ``is_active``, re-read on every hit. Entries
+    also expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._subs_by_pk = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sub):
+        """
+        Return a private copy of the cached user, or None
+        """
+        with self._lock:
+            entry = self._entries.get(sub)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._discard(sub)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+        _, version, user = entry
+        current = self._current_version(user) == version
+        with self._lock:
+            if not current:
+                if self._entries.get(sub) is entry:
+                    self._discard(sub)
+                self.misses += 1
+                return None
+            if sub in self._entries:
+                self._entries.move_to_end(sub)
+            self.hits += 1
+        # Views mutate request.user, so never hand out the shared instance
+        return copy.copy(user)
+
+    def set(self, sub, user):
+        if self.maxsize <= 0:
+            return
+        version = self._version(user)
+        with self._lock:
+            self._entries[sub] = (time.monotonic() + self.ttl, version, copy.copy(user))
+            self._entries.move_to_end(sub)
+            self._subs_by_pk[user.pk] = sub
+            while len(self._entries) > self.maxsize:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._subs_by_pk.pop(evicted.pk, None)
+
+    def _version(self, user):
+        if is_shared_cache():
+            return get_user_version(user.pk)
+        return (user.updated_at, user.is_active)
+
+    def _current_version(self, user):
+        if is_shared_cache():
+            return get_user_version(user.pk)
+        # Other workers' bumps never reach a per-process cache; ask the row
+        return type(user)._default_manager.filter(pk=user.pk).values_list('updated_at', 'is_active').first()
+
+    def invalidate(self, user):
+        """
+        Drop every entry that refers to the given user
+        """
+        with self._lock:
+            sub = self._subs_by_pk.get(user.pk)
+            if sub is not None:
+                self._discard(sub)
+            if user.auth0_id in self._entries:
+                self._discard(user.auth0_id)
+
+    def _discard(self, sub):
+        _, _, user = self._entries.pop(sub)
+        if self._subs_by_pk.get(user.pk) == sub:
+            del self._subs_by_pk[user.pk]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._subs_by_pk.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+class ProfileSync:
+    """
+    Write-behind queue for Auth0 profile claims that drifted from the database.
+
+    Changes for the same user are coalesced and written by a background
+    thread as a single ``UPDATE`` of just the changed columns.
+    """
+
+    def __init__(self, model, interval=2.0):
+        self.model = model
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def enqueue(self, pk, changes):
+        with self._lock:
+            self._pending.setdefault(pk, {}).update(changes)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Give bursts of requests for the same user time to coalesce
+            time.sleep(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Write all pending changes now
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for pk, changes in pending.items():
+            try:
+                self.model.objects.filter(pk=pk).update(updated_at=timezone.now(), **changes)
+            except DatabaseError as e:
+                logger.warning('Profile sync for user %s failed: %s', pk, e)
+                continue
+            # update() sends no signals
+            bump_user_version(pk)
+        return len(pending)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+
+# Resolved users shared by every Auth0Authentication instance in this process
+user_cache = UserCache(
+    maxsize=settings.JWT_SETTINGS.get('USER_CACHE_SIZE', 1024),
+    ttl=settings.JWT_SETTINGS.get('USER_CACHE_TTL', 60),
+)
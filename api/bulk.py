@@ -0,0 +1,233 @@
+"""
+Batch create/update/delete of jewelry items for the owner dashboard.
+
+A request carries a list of operations::
+
+    {"operations": [
+        {"op": "create", "data": {...}},
+        {"op": "update", "id": "<uuid>", "data": {...}},
+        {"op": "delete", "id": "<uuid>"}
+    ]}
+
+Everything is validated before anything is written, with every referenced
+item, category and subcategory loaded up front in a fixed number of
+queries. If any operation is invalid nothing is written; otherwise the
+writes run as one bulk_create, one bulk_update and one delete inside a
+single transaction, the updated rows re-read under select_for_update.
+"""
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.db.models import UUIDField, Value
+from django.utils import timezone
+
+from .caching import bump_generation
+from .models import Category, JewelryItem, Subcategory
+from .serializers import JewelryItemBulkSerializer, JewelryItemSerializer
+from .slugs import allocate_slugs
+
+MAX_OPERATIONS = 500
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BulkError(Exception):
+    """
+    The request as a whole is malformed or conflicts with the database
+    """
+
+    def __init__(self, detail, results=None, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.results = results
+        self.status = status
+
+
+def resolve_catalog_ids(category_ids, subcategory_ids):
+    """
+    Look up categories and subcategories in one UNION query
+
+    Returns ({category id}, {subcategory id: category id}).
+    """
+    if not category_ids and not subcategory_ids:
+        return set(), {}
+    categories = Category.objects.filter(pk__in=category_ids).annotate(
+        kind=Value('category'), parent=Value(None, output_field=UUIDField()),
+    ).values_list('kind', 'id', 'parent')
+    subcategories = Subcategory.objects.filter(pk__in=subcategory_ids).annotate(
+        kind=Value('subcategory'),
+    ).values_list('kind', 'id', 'category_id')
+
+    found_categories, found_subcategories = set(), {}
+    for kind, pk, parent in categories.union(subcategories, all=True):
+        if kind == 'category':
+            found_categories.add(pk)
+        else:
+            found_subcategories[pk] = parent
+    return found_categories, found_subcategories
+
+
+def _parse_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _collect_ids(operations, name):
+    ids = set()
+    for operation in operations:
+        data = operation.get('data') if isinstance(operation, dict) else None
+        if isinstance(data, dict) and data.get(name):
+            value = _parse_uuid(data[name])
+            if value is not None:
+                ids.add(value)
+    return ids
+
+
+def run_bulk_operations(operations):
+    """
+    Validate and apply ``operations``; return one result dict per operation
+
+    Raises BulkError, carrying the per-operation results, when any
+    operation is invalid.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BulkError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise BulkError(f'At most {MAX_OPERATIONS} operations per request')
+
+    targets = {}
+    for operation in operations:
+        if isinstance(operation, dict) and operation.get('op') in ('update', 'delete'):
+            pk = _parse_uuid(operation.get('id'))
+            if pk is not None:
+                targets[pk] = None
+    items = JewelryItem.objects.in_bulk(list(targets)) if targets else {}
+
+    # Current subcategories too, for updates that only move the category
+    subcategory_ids = _collect_ids(operations, 'subcategory') | {item.subcategory_id for item in items.values()}
+    categories, subcategories = resolve_catalog_ids(_collect_ids(operations, 'category'), subcategory_ids)
+    context = {'categories': categories, 'subcategories': subcategories}
+
+    results, creates, updates, deletes = [], [], [], []
+    seen, failed = set(), False
+    for index, operation in enumerate(operations):
+        result, error = _validate(index, operation, items, seen, context)
+        if error is not None:
+            failed = True
+            kind = operation.get('op') if isinstance(operation, dict) else None
+            results.append({'index': index, 'op': kind, 'status': 'error', 'errors': error})
+            continue
+        results.append(result)
+        kind, instance, validated = result.pop('_plan')
+        {'create': creates, 'update': updates, 'delete': deletes}[kind].append((result, instance, validated))
+
+    failed = _check_slugs(creates, updates) or failed
+    if failed:
+        for result in results:
+            if result['status'] != 'error':
+                result['status'] = 'valid'
+        raise BulkError('No operations were applied because some are invalid', results)
+
+    try:
+        with transaction.atomic():
+            _apply(creates, updates, deletes)
+    except IntegrityError as exc:
+        raise BulkError(f'Conflicting concurrent change, nothing was applied: {exc}', status=409)
+    return results
+
+
+def _validate(index, operation, items, seen, context):
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+        return None, {'op': [f"Must be one of: {', '.join(OPERATIONS)}"]}
+    kind = operation['op']
+    result = {'index': index, 'op': kind}
+
+    instance = None
+    if kind != 'create':
+        pk = _parse_uuid(operation.get('id'))
+        if pk is None:
+            return None, {'id': ['Must be a valid UUID.']}
+        if pk in seen:
+            return None, {'id': ['Only one operation per item is allowed.']}
+        seen.add(pk)
+        instance = items.get(pk)
+        if instance is None:
+            return None, {'id': [f'Invalid pk "{pk}" - object does not exist.']}
+        result['id'] = str(pk)
+    if kind == 'delete':
+        result['status'] = 'deleted'
+        result['_plan'] = (kind, instance, None)
+        return result, None
+
+    data = operation.get('data')
+    if not isinstance(data, dict):
+        return None, {'data': ['Must be an object.']}
+    serializer = JewelryItemBulkSerializer(instance, data=data, partial=kind == 'update', context=context)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    result['status'] = 'created' if kind == 'create' else 'updated'
+    result['_plan'] = (kind, instance, serializer.validated_data)
+    return result, None
+
+
+def _check_slugs(creates, updates):
+    """
+    Reject explicit slugs that clash with each other or with other items
+    """
+    requested = {}
+    for result, instance, validated in creates + updates:
+        slug = validated.get('slug')
+        if slug and (instance is None or slug != instance.slug):
+            requested.setdefault(slug, []).append((result, instance))
+    if not requested:
+        return False
+
+    taken = set(JewelryItem.objects.filter(slug__in=list(requested)).values_list('slug', flat=True))
+    failed = False
+    for slug, claims in requested.items():
+        if len(claims) > 1 or slug in taken:
+            for result, _ in claims:
+                result.update(status='error', errors={'slug': ['jewelry item with this slug already exists.']})
+            failed = True
+    return failed
+
+
+def _apply(creates, updates, deletes):
+    now = timezone.now()
+
+    if creates:
+        new_items = [JewelryItem(**validated) for _, _, validated in creates]
+        unnamed = [item for item in new_items if not item.slug]
+        claimed = {validated['slug'] for _, _, validated in creates + updates if validated.get('slug')}
+        for item, slug in zip(unnamed, allocate_slugs(JewelryItem, [item.name for item in unnamed], reserved=claimed)):
+            item.slug = slug
+        JewelryItem.objects.bulk_create(new_items)
+        for (result, _, _), item in zip(creates, new_items):
+            result['id'] = str(item.pk)
+            result['item'] = JewelryItemSerializer(item).data
+
+    if updates:
+        # Apply the changes to the rows as they are now, locked until commit;
+        # bulk_update writes every touched field on every row, so a copy read
+        # during validation would undo concurrent edits to the other fields
+        current = JewelryItem.objects.select_for_update().in_bulk([instance.pk for _, instance, _ in updates])
+        if len(current) != len(updates):
+            raise BulkError('Conflicting concurrent change, nothing was applied: an updated item was deleted',
+                            status=409)
+        fields = {'updated_at'}
+        for _, instance, validated in updates:
+            instance = current[instance.pk]
+            for attr, value in validated.items():
+                setattr(instance, attr, value)
+                fields.add(JewelryItem._meta.get_field(attr).name)
+            instance.updated_at = now
+        JewelryItem.objects.bulk_update(list(current.values()), sorted(fields))
+        for result, instance, _ in updates:
+            result['item'] = JewelryItemSerializer(current[instance.pk]).data
+
+    if deletes:
+        JewelryItem.objects.filter(pk__in=[instance.pk for _, instance, _ in deletes]).delete()
+
+    # bulk_create/bulk_update send no signals
+    transaction.on_commit(lambda: bump_generation(JewelryItem))
@@ -0,0 +1,347 @@
+"""
+Versioned response cache for the public catalog endpoints.
+
+Every cached model has a generation number stored in the Django cache.
+Signals bump it on every write (see api.models), and cached responses are
+keyed by the generations they were built from, so a write makes older
+entries unreachable instead of having to find and delete them. That only
+holds across workers when the backend is shared (see CACHES in settings).
+With a per-process backend such as LocMemCache nothing is stored, and the
+conditional-request validators come from a fingerprint read from the
+database instead (see get_fingerprint).
+
+JSON responses are stored already rendered, together with their gzip and
+(if the optional ``brotli`` package is installed) brotli encodings, so
+compression runs once per catalog change rather than once per request.
+Like every stored response this needs a shared backend; on a per-process
+one the views answer uncompressed.
+"""
+import gzip
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.response import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+GENERATION_KEY = 'catalog:generation:{}'
+MODIFIED_KEY = 'catalog:modified:{}'
+RESPONSE_KEY = 'catalog:response:{}'
+ENCODED_KEY = 'catalog:encoded:{}:{}'
+
+# Backends whose contents other worker processes cannot see
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+# Preferred first when the client weighs them equally
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=11)
+ENCODERS['gzip'] = lambda body: gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def _generation_key(model):
+    return GENERATION_KEY.format(model._meta.label_lower)
+
+
+def is_shared_cache():
+    """
+    Whether every worker sees the same default cache
+    """
+    return not isinstance(caches['default'], LOCAL_BACKENDS)
+
+
+def get_generations(*models):
+    """
+    Return the current generation of each model
+    """
+    keys = [_generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            # Seed from the clock so a flushed cache never reuses old numbers
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        generations.append(found[key])
+    return tuple(generations)
+
+
+def _change_field(model):
+    """
+    The timestamp field that moves when a row of ``model`` is written, if any
+    """
+    names = {field.name for field in model._meta.get_fields()}
+    return next((name for name in ('updated_at', 'created_at') if name in names), None)
+
+
+def _seed_last_modified(model):
+    """
+    Best known modification time for a model whose timestamp isn't cached yet
+    """
+    field = _change_field(model)
+    if field is not None:
+        latest = model.objects.aggregate(latest=Max(field))['latest']
+        if latest is not None:
+            return latest.timestamp()
+    return time.time()
+
+
+def get_fingerprint(*models):
+    """
+    Return (row count, latest change as a Unix timestamp) for each model
+
+    Read from the database, so unlike the generations it reflects writes
+    made through every worker. Deletes change the count but not the
+    timestamp, which is why it is paired with the count.
+    """
+    fingerprint = []
+    for model in models:
+        field = _change_field(model)
+        aggregates = {'count': Count('pk')}
+        if field is not None:
+            aggregates['latest'] = Max(field)
+        row = model.objects.order_by().aggregate(**aggregates)
+        latest = row.get('latest')
+        fingerprint.append((row['count'], latest.timestamp() if latest is not None else None))
+    return tuple(fingerprint)
+
+
+def get_last_modified(*models):
+    """
+    Return when any of the models last changed, as a fractional Unix timestamp
+    """
+    keys = {model: MODIFIED_KEY.format(model._meta.label_lower) for model in models}
+    found = cache.get_many(keys.values())
+    for model, key in keys.items():
+        if key not in found:
+            cache.add(key, _seed_last_modified(model), None)
+            found[key] = cache.get(key)
+    return max(found.values())
+
+
+def bump_generation(*models):
+    """
+    Invalidate every cached response built from the given models
+    """
+    now = time.time()
+    for model in models:
+        key = _generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+        cache.set(MODIFIED_KEY.format(model._meta.label_lower), now, None)
+
+
+def choose_encoding(accept_encoding):
+    """
+    Pick the stored encoding the Accept-Encoding header ranks highest
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = 'identity', 0.0
+    for encoding in ENCODERS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def encode_variants(body):
+    """
+    The rendered body under every supported Content-Encoding
+    """
+    variants = {'identity': body}
+    for encoding, compress in ENCODERS.items():
+        variants[encoding] = compress(body)
+    return variants
+
+
+def serializer_models(serializer):
+    """
+    Models rendered by ``serializer`` and every serializer nested in it
+    """
+    models, pending = [], [serializer]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, serializers.ListSerializer):
+            current = current.child
+        model = getattr(getattr(current, 'Meta', None), 'model', None)
+        if model is not None and model not in models:
+            models.append(model)
+        pending.extend(field for field in current.fields.values() if isinstance(field, serializers.BaseSerializer))
+    return models
+
+
+class CacheStats:
+    """
+    Per-process hit/miss counters for the response cache
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+cache_stats = CacheStats()
+
+
+class CachedReadMixin:
+    """
+    Serve list/retrieve with conditional GET, from the versioned response cache
+
+    Views set ``cache_models`` to the models their payload is built from;
+    models pulled in by ?expand= are added to them.
+    A digest of those models' state doubles as a strong ETag and their last
+    change as Last-Modified, so conditional requests for unchanged resources
+    get a 304 without running the serializer. With a shared cache the state
+    is the generations and the rendered body is stored under the digest;
+    with a per-process cache it is get_fingerprint() and every 200 is built
+    afresh. HTTP dates only have whole seconds, so Last-Modified is left out
+    (and If-Modified-Since ignored) until the second of the last write has
+    passed; a second write within it would otherwise look unmodified.
+    """
+    cache_models = ()
+    cache_timeout = 60 * 15
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_models(self):
+        """
+        ``cache_models`` plus the models of the serializers ?expand= nests in
+        """
+        models = list(self.cache_models)
+        if self.request.query_params.get('expand'):
+            models += [model for model in serializer_models(self.get_serializer()) if model not in models]
+        return tuple(models)
+
+    def get_version(self, request, state):
+        """
+        Digest identifying this representation at the given model state
+        """
+        raw = (f'{self.basename}:{self.action}:{state}:{request.get_full_path()}:'
+               f'{request.accepted_renderer.format}')
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        shared = is_shared_cache()
+        models = self.get_cache_models()
+        if shared:
+            state = get_generations(*models)
+            last_modified = get_last_modified(*models)
+        else:
+            # This process's generations miss other workers' writes
+            state = get_fingerprint(*models)
+            last_modified = max((latest for _, latest in state if latest is not None), default=None)
+        version = self.get_version(request, state)
+        if last_modified is not None and int(last_modified) < int(time.time()):
+            last_modified = int(last_modified)
+        else:
+            last_modified = None
+
+        # Only JSON is stored pre-rendered; the browsable API renders per user
+        precompressed = shared and request.accepted_renderer.format == 'json'
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')) if precompressed else 'identity'
+        # Each encoding is a distinct representation with its own ETag
+        etag = f'"{version}"' if encoding == 'identity' else f'"{version}-{encoding}"'
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            if precompressed:
+                patch_vary_headers(not_modified, ('Accept-Encoding',))
+            return not_modified
+
+        if shared:
+            if precompressed:
+                response, hit = self._encoded_response(handler, request, version, encoding, *args, **kwargs)
+            else:
+                response, hit = self._data_response(handler, request, version, *args, **kwargs)
+            cache_stats.record(hit)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            response['X-Cache-Hit-Ratio'] = f'{cache_stats.hit_ratio:.3f}'
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def _data_response(self, handler, request, version, *args, **kwargs):
+        key = RESPONSE_KEY.format(version)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data), True
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response, False
+
+    def _encoded_response(self, handler, request, version, encoding, *args, **kwargs):
+        entry = cache.get(ENCODED_KEY.format(version, encoding))
+        hit = entry is not None
+        if not hit:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response, False
+            # Render now, as finalize_response would, so the bytes can be stored
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            variants = encode_variants(response.rendered_content)
+            content_type = response['Content-Type']
+            cache.set_many(
+                {ENCODED_KEY.format(version, name): (content_type, body) for name, body in variants.items()},
+                self.cache_timeout,
+            )
+            entry = (content_type, variants[encoding])
+
+        content_type, body = entry
+        response = HttpResponse(body, content_type=content_type)
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(body))
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response, hit
@@ -0,0 +1,351 @@
+"""
+Cart storage behind one interface.
+
+``get_cart_store()`` returns the store selected by ``CART_STORE``; the cart
+views only ever talk to it. ``DatabaseCartStore`` reads and writes the
+``api_cart``/``api_cartitem`` rows directly. ``CacheCartStore`` keeps each
+user's cart in the Django cache as a compact record::
+
+    {'id': cart id, 'created_at': ..., 'updated_at': ...,
+     'lines': {jewelry item id: [cart item id, quantity]}, 'dirty': bool}
+
+so cart reads and writes touch only the cache (plus the product rows the
+response shows). Changed carts are queued with a per-process ``CartSync``
+that writes them back to ``api_cartitem`` every ``CART_FLUSH_INTERVAL``
+seconds; checkout flushes synchronously first (see ``persisted``).
+Records are read and written under a short cache lock, so the cache mode
+requires a shared backend (see CACHES); ``get_cart_store`` refuses to run
+it on a per-process one.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import is_shared_cache
+from .carts import CartError, add_to_cart, set_quantity
+from .models import Cart, CartItem, JewelryItem
+
+logger = logging.getLogger(__name__)
+
+RECORD_KEY = 'cart:record:{}'
+LOCK_KEY = 'cart:lock:{}'
+RECORD_TIMEOUT = 60 * 60 * 24 * 7
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+CENT = Decimal('0.01')
+
+
+class DatabaseCartStore:
+    """
+    Carts read and written as rows, each change a single statement
+    """
+
+    def get_cart(self, user, queryset):
+        """
+        The user's cart with its items, or None; ``queryset`` is the view's
+        """
+        return queryset.filter(user=user).first()
+
+    def get_items(self, user, queryset):
+        return list(queryset)
+
+    def get_item(self, user, pk, queryset):
+        try:
+            return queryset.filter(pk=uuid.UUID(str(pk))).first()
+        except ValueError:
+            return None
+
+    def add(self, user, quantities):
+        """
+        Add {jewelry item id: quantity}; return the affected cart items
+        """
+        cart_id = Cart.objects.filter(user=user).values_list('id', flat=True).first()
+        if cart_id is None:
+            raise CartError('Cart not found', status=404)
+        return add_to_cart(cart_id, quantities)
+
+    def set_quantity(self, user, pk, quantity):
+        return set_quantity(user, pk, quantity)
+
+    def clear(self, user):
+        if not Cart.objects.filter(user=user).exists():
+            raise CartError('Cart not found', status=404)
+        CartItem.objects.filter(cart__user=user).delete()
+
+    def summary(self, user):
+        """
+        Line count, item count and subtotal, computed in the database
+        """
+        totals = CartItem.objects.filter(cart__user=user).aggregate(
+            line_count=Count('id'),
+            item_count=Coalesce(Sum('quantity'), 0),
+            subtotal=Coalesce(
+                Sum(F('quantity') * F('jewelry_item__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        totals['subtotal'] = str(Decimal(totals['subtotal']).quantize(CENT))
+        return totals
+
+    def persisted(self, user):
+        """
+        Context in which the cart's rows are current; they always are here
+        """
+        return nullcontext()
+
+
+class CacheCartStore:
+    """
+    Carts held in the cache and written back to the database behind the scenes
+    """
+
+    @contextmanager
+    def _locked(self, user_id):
+        key = LOCK_KEY.format(user_id)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(key, token, LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise CartError('Cart is busy, try again', status=409)
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if cache.get(key) == token:
+                cache.delete(key)
+
+    def _load(self, user_id):
+        """
+        Build a record from the database
+        """
+        cart = Cart.objects.filter(user_id=user_id).values('id', 'created_at', 'updated_at').first()
+        if cart is None:
+            raise CartError('Cart not found', status=404)
+        lines = CartItem.objects.filter(cart_id=cart['id']).values_list('jewelry_item_id', 'id', 'quantity')
+        return {
+            'id': str(cart['id']),
+            'created_at': cart['created_at'],
+            'updated_at': cart['updated_at'],
+            'lines': {str(item_id): [str(pk), quantity] for item_id, pk, quantity in lines},
+            'dirty': False,
+        }
+
+    def _record(self, user_id):
+        record = cache.get(RECORD_KEY.format(user_id))
+        if record is None:
+            record = self._load(user_id)
+            cache.set(RECORD_KEY.format(user_id), record, RECORD_TIMEOUT)
+        return record
+
+    def _save(self, user_id, record):
+        record['updated_at'] = timezone.now()
+        record['dirty'] = True
+        cache.set(RECORD_KEY.format(user_id), record, RECORD_TIMEOUT)
+        cart_sync.enqueue(user_id)
+
+    def _items(self, record, jewelry_item_ids=None):
+        """
+        Unsaved CartItem instances for the record's lines, products loaded in one query
+        """
+        lines = record['lines']
+        if jewelry_item_ids is not None:
+            lines = {key: lines[key] for key in map(str, jewelry_item_ids) if key in lines}
+        products = JewelryItem.objects.in_bulk(list(lines))
+        items = []
+        for item_id, (pk, quantity) in lines.items():
+            product = products.get(uuid.UUID(item_id))
+            if product is not None:
+                items.append(CartItem(id=pk, cart_id=record['id'], jewelry_item=product, quantity=quantity))
+        return items
+
+    def get_cart(self, user, queryset):
+        try:
+            record = self._record(user.id)
+        except CartError:
+            return None
+        cart = Cart(id=record['id'], user_id=user.id, created_at=record['created_at'], updated_at=record['updated_at'])
+        # Served to cart.items.all() the same way prefetch_related results are
+        cart._prefetched_objects_cache = {'items': self._items(record)}
+        return cart
+
+    def get_items(self, user, queryset):
+        return self._items(self._record(user.id))
+
+    def get_item(self, user, pk, queryset):
+        return next((item for item in self.get_items(user, queryset) if str(item.pk) == str(pk)), None)
+
+    def add(self, user, quantities):
+        found = set(JewelryItem.objects.filter(pk__in=list(quantities), is_active=True).values_list('pk', flat=True))
+        missing = [str(pk) for pk in quantities if pk not in found]
+        if missing:
+            raise CartError(f'Unknown or unavailable products: {", ".join(missing)}')
+        with self._locked(user.id):
+            record = self._record(user.id)
+            for pk, quantity in quantities.items():
+                line = record['lines'].setdefault(str(pk), [str(uuid.uuid4()), 0])
+                line[1] += quantity
+            self._save(user.id, record)
+        return self._items(record, list(quantities))
+
+    def set_quantity(self, user, pk, quantity):
+        with self._locked(user.id):
+            record = self._record(user.id)
+            item_id = next((key for key, line in record['lines'].items() if line[0] == str(pk)), None)
+            if item_id is None:
+                return False
+            if quantity <= 0:
+                del record['lines'][item_id]
+            else:
+                record['lines'][item_id][1] = quantity
+            self._save(user.id, record)
+        return True
+
+    def clear(self, user):
+        with self._locked(user.id):
+            record = self._record(user.id)
+            record['lines'] = {}
+            self._save(user.id, record)
+
+    def summary(self, user):
+        items = self._items(self._record(user.id))
+        subtotal = sum((item.quantity * item.jewelry_item.price for item in items), Decimal('0'))
+        return {
+            'line_count': len(items),
+            'item_count': sum(item.quantity for item in items),
+            'subtotal': str(subtotal.quantize(CENT)),
+        }
+
+    def _write(self, record):
+        """
+        Make the cart's rows match the record
+        """
+        cart_id = record['id']
+        lines = record['lines']
+        # Products deleted since they were added are dropped
+        live = {str(pk) for pk in JewelryItem.objects.filter(pk__in=list(lines)).values_list('pk', flat=True)}
+        with transaction.atomic():
+            CartItem.objects.filter(cart_id=cart_id).exclude(jewelry_item_id__in=list(live)).delete()
+            CartItem.objects.bulk_create(
+                [CartItem(id=pk, cart_id=cart_id, jewelry_item_id=item_id, quantity=quantity)
+                 for item_id, (pk, quantity) in lines.items() if item_id in live],
+                update_conflicts=True,
+                unique_fields=['cart', 'jewelry_item'],
+                update_fields=['quantity'],
+            )
+            Cart.objects.filter(pk=cart_id).update(updated_at=record['updated_at'])
+
+    def _flush_locked(self, user_id):
+        record = cache.get(RECORD_KEY.format(user_id))
+        if record is None or not record['dirty']:
+            return False
+        self._write(record)
+        # Reload so line ids match rows another writer may have created
+        cache.set(RECORD_KEY.format(user_id), self._load(user_id), RECORD_TIMEOUT)
+        return True
+
+    def flush(self, user_id):
+        """
+        Write the user's cart back to the database now if it has unsaved changes
+        """
+        with self._locked(user_id):
+            return self._flush_locked(user_id)
+
+    @contextmanager
+    def persisted(self, user):
+        """
+        Flush the cart and hold it while the caller works on its rows directly
+
+        Used around checkout and any other database-side cart change. The
+        record is dropped afterwards so the next read reloads from the rows.
+        """
+        with self._locked(user.id):
+            self._flush_locked(user.id)
+            try:
+                yield
+            finally:
+                cache.delete(RECORD_KEY.format(user.id))
+
+
+class CartSync:
+    """
+    Write-behind queue of users whose cached cart has unsaved changes
+    """
+
+    def __init__(self, store, interval=5.0):
+        self.store = store
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def enqueue(self, user_id):
+        with self._lock:
+            self._pending.add(user_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Coalesce the burst of edits a shopping session makes
+            time.sleep(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Write every queued cart now
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+
+        for user_id in pending:
+            try:
+                self.store.flush(user_id)
+            except (CartError, DatabaseError) as e:
+                logger.warning('Cart flush for user %s failed: %s', user_id, e)
+                with self._lock:
+                    self._pending.add(user_id)
+                # Retry after the next interval
+                self._wakeup.set()
+        return len(pending)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+
+database_store = DatabaseCartStore()
+cache_store = CacheCartStore()
+cart_sync = CartSync(cache_store, interval=getattr(settings, 'CART_FLUSH_INTERVAL', 5.0))
+
+
+def get_cart_store():
+    """
+    The store selected by the CART_STORE setting
+    """
+    if getattr(settings, 'CART_STORE', 'database') == 'cache':
+        if not is_shared_cache():
+            raise ImproperlyConfigured(
+                "CART_STORE = 'cache' needs a shared CACHE_BACKEND; each worker would keep its own carts"
+            )
+        return cache_store
+    return database_store
@@ -0,0 +1,116 @@
+"""
+Cart writes as single statements.
+
+Adding to the cart is an ``INSERT ... ON CONFLICT (cart_id, jewelry_item_id)
+DO UPDATE SET quantity = quantity + EXCLUDED.quantity``, so two concurrent
+adds of the same product (a double click) both land as increments instead
+of one of them failing on the unique constraint. Both PostgreSQL and SQLite
+support this form.
+"""
+import uuid
+
+from django.db import connection, transaction
+from rest_framework.exceptions import APIException
+
+from .models import CartItem, JewelryItem
+
+MAX_BULK_ITEMS = 100
+
+
+class CartError(APIException):
+    """
+    The requested cart change is invalid; DRF renders it with ``status``
+    """
+    status_code = 400
+    default_detail = 'Invalid cart change.'
+    default_code = 'cart_error'
+
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.status_code = status
+
+
+def parse_quantities(entries):
+    """
+    Merge [{jewelry_item_id, quantity}] entries into {item id: quantity}
+    """
+    if not isinstance(entries, list) or not entries:
+        raise CartError('items must be a non-empty list')
+    if len(entries) > MAX_BULK_ITEMS:
+        raise CartError(f'At most {MAX_BULK_ITEMS} items per request')
+
+    quantities = {}
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise CartError(f'items[{index}] must be an object')
+        try:
+            pk = uuid.UUID(str(entry.get('jewelry_item_id')))
+        except ValueError:
+            raise CartError(f'items[{index}].jewelry_item_id must be a valid UUID')
+        quantity = entry.get('quantity', 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, (int, str)):
+            raise CartError(f'items[{index}].quantity must be a positive integer')
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            raise CartError(f'items[{index}].quantity must be a positive integer')
+        if quantity <= 0:
+            raise CartError(f'items[{index}].quantity must be a positive integer')
+        quantities[pk] = quantities.get(pk, 0) + quantity
+    return quantities
+
+
+def _upsert_sql(rows):
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    columns = [CartItem._meta.get_field(name) for name in ('id', 'cart', 'jewelry_item', 'quantity')]
+    placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    cart, jewelry_item, quantity = (qn(field.column) for field in columns[1:])
+    sql = (
+        f'INSERT INTO {table} ({", ".join(qn(field.column) for field in columns)}) '
+        f'VALUES {placeholders} '
+        f'ON CONFLICT ({cart}, {jewelry_item}) '
+        f'DO UPDATE SET {quantity} = {table}.{quantity} + EXCLUDED.{quantity}'
+    )
+    params = []
+    for row in rows:
+        params.extend(field.get_db_prep_value(value, connection) for field, value in zip(columns, row))
+    return sql, params
+
+
+def add_to_cart(cart_id, quantities):
+    """
+    Add {jewelry item id: quantity} to the cart, incrementing existing lines
+
+    Unknown or inactive products are rejected before anything is written.
+    Returns the affected cart items with their products.
+    """
+    found = set(JewelryItem.objects.filter(pk__in=list(quantities), is_active=True).values_list('pk', flat=True))
+    missing = [str(pk) for pk in quantities if pk not in found]
+    if missing:
+        raise CartError(f'Unknown or unavailable products: {", ".join(missing)}')
+
+    rows = [(uuid.uuid4(), cart_id, pk, quantity) for pk, quantity in quantities.items()]
+    sql, params = _upsert_sql(rows)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    return list(
+        CartItem.objects.filter(cart_id=cart_id, jewelry_item_id__in=list(quantities)).select_related('jewelry_item')
+    )
+
+
+def set_quantity(user, pk, quantity):
+    """
+    Set a cart line's quantity in one UPDATE, or remove it when quantity <= 0
+
+    Returns False when the user has no such cart item.
+    """
+    try:
+        pk = uuid.UUID(str(pk))
+    except ValueError:
+        return False
+    items = CartItem.objects.filter(pk=pk, cart__user=user)
+    if quantity <= 0:
+        return items.delete()[0] > 0
+    return items.update(quantity=quantity) > 0
@@ -0,0 +1,75 @@
+"""
+Row formats shared by the catalog_import and catalog_export commands.
+
+A catalog row is one product with its category and subcategory given by
+name. CSV files carry a header with ``CATALOG_COLUMNS``; JSONL files carry
+one JSON object per line with the same keys. Both are read and written a
+row at a time so files of any size stream in constant memory.
+"""
+import csv
+import json
+import os
+
+CATALOG_COLUMNS = [
+    'slug', 'name', 'description', 'price', 'category', 'subcategory',
+    'weight', 'image_url', 'is_active',
+]
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    """
+    Return the explicit format, or the one implied by the file extension
+    """
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    raise ValueError(f"Can't tell the format of '{path}'; pass --format")
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict) pairs from a CSV or JSONL text stream
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError('Expected a JSON object')
+            continue
+        yield line_number, row
+
+
+class RowWriter:
+    """
+    Write catalog rows to a text stream as CSV or JSONL
+    """
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.writer(stream)
+            self.writer.writerow(CATALOG_COLUMNS)
+
+    def write(self, values):
+        if self.fmt == 'csv':
+            self.writer.writerow(['' if value is None else value for value in values])
+        else:
+            row = dict(zip(CATALOG_COLUMNS, values))
+            self.stream.write(json.dumps(row, default=str, ensure_ascii=False))
+            self.stream.write('\n')
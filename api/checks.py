@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .caching import is_shared_cache
+
+
+@register()
+def check_cart_store(app_configs, **kwargs):
+    """
+    The cache cart store needs a cache every worker can see
+    """
+    if getattr(settings, 'CART_STORE', 'database') == 'cache' and not is_shared_cache():
+        return [Error(
+            "CART_STORE = 'cache' requires a shared cache backend.",
+            hint='Set CACHE_BACKEND (and CACHE_LOCATION) to e.g. RedisCache, or use CART_STORE=database.',
+            id='api.E001',
+        )]
+    return []
@@ -0,0 +1,153 @@
+"""
+Read fast path for hot list endpoints.
+
+``RowBuilder`` compiles a serializer's fields once into (key, values()
+lookup, converter) triples and then turns ``.values()`` dicts straight into
+response rows, skipping model instantiation and the per-field machinery of
+``Serializer.to_representation``. Converters reproduce what the DRF field
+would return, so the rendered JSON is byte for byte the same.
+"""
+import decimal
+
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+
+class Unsupported(Exception):
+    """
+    Raised when a serializer field can't be served from .values()
+    """
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    # Same quantization as DecimalField.quantize, with the context built once
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _nullable(convert):
+    def wrapper(value):
+        return None if value is None else convert(value)
+    return wrapper
+
+
+def _converter(field):
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.RelatedField):
+        # Anything else needs the related instance
+        raise Unsupported(field.field_name)
+    return field.to_representation
+
+
+class RowBuilder:
+    """
+    Precompiled .values() -> response row conversion for one serializer
+
+    ``overrides`` maps field names to a values() lookup for fields whose
+    representation is not a plain column, e.g. ``{'user': 'user__email'}``
+    for a StringRelatedField over a model whose __str__ is its email.
+    """
+
+    def __init__(self, serializer, overrides=None):
+        overrides = overrides or {}
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        self.specs = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in overrides:
+                self.specs.append((name, overrides[name], _nullable(str)))
+                continue
+            if field.source == '*' or '.' in field.source or isinstance(field, serializers.BaseSerializer):
+                raise Unsupported(name)
+            convert = _converter(field)
+            if convert is not None and field.allow_null:
+                # Serializer.to_representation never passes None to a field
+                convert = _nullable(convert)
+            self.specs.append((name, field.source, convert))
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup, _ in self.specs]
+
+    def __call__(self, rows):
+        specs = self.specs
+        return [
+            {name: row[lookup] if convert is None else convert(row[lookup]) for name, lookup, convert in specs}
+            for row in rows
+        ]
+
+
+class ValuesListMixin:
+    """
+    ViewSet mixin serving plain list requests through a RowBuilder
+
+    Requests with ?fields= or ?expand= take the regular serializer path,
+    as does any serializer the builder can't compile.
+    """
+    values_overrides = {}
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if params.get('fields') or params.get('expand'):
+            return super().list(request, *args, **kwargs)
+        try:
+            builder = RowBuilder(self.get_serializer(), self.values_overrides)
+        except Unsupported:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = builder.lookups
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            # The paginator reads its cursor from the rows it returns
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            lookups += [field.lstrip('-') for field in ordering if field.lstrip('-') not in lookups]
+        rows = queryset.values(*lookups)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(builder(page))
+        return Response(builder(rows))
@@ -0,0 +1,191 @@
+"""
+Sparse fieldsets (?fields=) and opt-in expansion (?expand=) for serializers.
+
+Both parameters take comma separated field names; dotted paths reach into
+nested serializers, e.g. ``?fields=id,quantity,jewelry_item.name`` or
+``?expand=category,subcategory``. ``sparse_queryset`` turns the resulting
+serializer shape into ``select_related``/``prefetch_related``/``only`` so
+columns that are not rendered are never loaded.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def parse_field_paths(value):
+    """
+    'id,item.name,item.price' -> {'id': {}, 'item': {'name': {}, 'price': {}}}
+    """
+    tree = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _nested(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin that honours ?fields= and ?expand= on safe requests
+
+    ``expandable_fields`` maps a field name to the serializer class that
+    replaces it when the client asks for it to be expanded.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = kwargs.get('context', {}).get('request')
+        if request is not None and request.method in ('GET', 'HEAD'):
+            params = getattr(request, 'query_params', request.GET)
+            self.apply_fieldsets(parse_field_paths(params.get('fields')),
+                                 parse_field_paths(params.get('expand')))
+
+    def apply_fieldsets(self, fields, expand):
+        for name in expand:
+            if name in self.expandable_fields and name in self.fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        if fields:
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            nested = _nested(field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.apply_fieldsets(fields.get(name, {}), expand.get(name, {}))
+
+
+def _plan(serializer, model, prefix, plan):
+    """
+    Collect the columns and joins needed to render ``serializer``
+
+    Returns False if some field reads data we can't map to columns, in which
+    case the caller must not restrict the columns it loads.
+    """
+    plan['only'].add(f'{prefix}{model._meta.pk.name}')
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return False
+        attr = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Properties and methods may read any column
+            return False
+
+        nested = _nested(field)
+        if nested is None:
+            if model_field.concrete:
+                plan['only'].add(f'{prefix}{attr}')
+            elif model_field.is_relation:
+                return False
+            continue
+
+        related_model = model_field.related_model
+        if model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            plan['only'].add(f'{prefix}{attr}')
+            plan['select_related'].add(f'{prefix}{attr}')
+            if not _plan(nested, related_model, f'{prefix}{attr}__', plan):
+                return False
+        elif model_field.one_to_many and not prefix:
+            # Reverse FK on the root: prefetch with its own restricted queryset
+            child = {'only': set(), 'select_related': set(), 'prefetch': []}
+            if not _plan(nested, related_model, '', child):
+                child['only'] = None
+            else:
+                child['only'].add(model_field.field.name)
+            plan['prefetch'].append((attr, related_model, child))
+        else:
+            return False
+    return True
+
+
+def _select_related_paths(tree, prefix=''):
+    for name, subtree in tree.items():
+        yield f'{prefix}{name}'
+        yield from _select_related_paths(subtree, f'{prefix}{name}__')
+
+
+def _merge_prefetch(lookups, attr, related_model, child):
+    """
+    Add a Prefetch for ``attr``, built on top of any the view already set up
+
+    Two Prefetch objects for the same lookup with different querysets
+    are an error, so an existing one is replaced in place by a single
+    Prefetch whose queryset keeps the view's joins and filters.
+    """
+    base, position = related_model._default_manager.all(), len(lookups)
+    for index, lookup in enumerate(lookups):
+        if isinstance(lookup, Prefetch) and lookup.prefetch_to == attr and lookup.to_attr is None:
+            if lookup.queryset is not None:
+                base = lookup.queryset
+            position = index
+            break
+        if lookup == attr:
+            position = index
+            break
+    inner = _apply_plan(base, child, child['only'] is not None)
+    lookups[position:position + 1] = [Prefetch(attr, queryset=inner)]
+
+
+def _apply_plan(queryset, plan, restrict):
+    if plan['select_related']:
+        queryset = queryset.select_related(*plan['select_related'])
+    if plan['prefetch']:
+        lookups = list(queryset._prefetch_related_lookups)
+        for attr, related_model, child in plan['prefetch']:
+            _merge_prefetch(lookups, attr, related_model, child)
+        queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+    if restrict and plan['only']:
+        joins = queryset.query.select_related
+        if joins is True:
+            # select_related() with no arguments follows every FK; leave it be
+            return queryset
+        # A relation can't be both deferred and joined, so keep the view's joins
+        queryset = queryset.only(*plan['only'], *(_select_related_paths(joins) if joins else ()))
+    return queryset
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Load only what ``serializer`` (after apply_fieldsets) will render
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plan = {'only': set(), 'select_related': set(), 'prefetch': []}
+    restrict = _plan(serializer, queryset.model, '', plan)
+    if not restrict:
+        # Joins are still safe; only column pruning is skipped
+        plan['only'] = set()
+    return _apply_plan(queryset, plan, restrict)
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin that prunes querysets to the fields requested via ?fields=
+
+    Hooks filter_queryset rather than get_queryset so it also covers views
+    that build their queryset without calling super().
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.request.method in ('GET', 'HEAD') and (params.get('fields') or params.get('expand')):
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
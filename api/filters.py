@@ -0,0 +1,98 @@
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+# ?ordering= value -> keyset ordering; 'id' breaks ties so cursors stay stable
+JEWELRY_ITEM_ORDERINGS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    # Best rated first; among equal averages, the most reviewed
+    'rating': ('average_rating', 'rating_count', 'id'),
+    '-rating': ('-average_rating', '-rating_count', '-id'),
+}
+DEFAULT_JEWELRY_ITEM_ORDERING = '-created_at'
+
+
+def _parse_uuid(value, name):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a valid UUID.'})
+
+
+def parse_uuid_param(params, name):
+    """
+    Return the UUID in params[name], or None when the parameter is absent
+    """
+    if not params.get(name):
+        return None
+    return _parse_uuid(params[name], name)
+
+
+def parse_uuid_list(value, name='ids'):
+    """
+    Return the UUIDs in a comma-separated parameter value, skipping blanks
+    """
+    return [_parse_uuid(part.strip(), name) for part in (value or '').split(',') if part.strip()]
+
+
+def _parse_decimal(params, name):
+    try:
+        value = Decimal(params[name])
+    except InvalidOperation:
+        raise ValidationError({name: 'Must be a number.'})
+    if not value.is_finite():
+        raise ValidationError({name: 'Must be a number.'})
+    return value
+
+
+def _parse_bool(params, name):
+    value = params[name].lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValidationError({name: 'Must be true or false.'})
+
+
+def filter_jewelry_items(queryset, params):
+    """
+    Apply the products endpoint query parameters to a queryset
+
+    Supported: category, subcategory, slug, min_price, max_price,
+    min_weight, max_weight and is_active.
+    """
+    filters = {}
+    if params.get('category'):
+        filters['category_id'] = parse_uuid_param(params, 'category')
+    if params.get('subcategory'):
+        filters['subcategory_id'] = parse_uuid_param(params, 'subcategory')
+    if params.get('slug'):
+        filters['slug'] = params['slug']
+    if params.get('min_price'):
+        filters['price__gte'] = _parse_decimal(params, 'min_price')
+    if params.get('max_price'):
+        filters['price__lte'] = _parse_decimal(params, 'max_price')
+    if params.get('min_weight'):
+        filters['weight__gte'] = _parse_decimal(params, 'min_weight')
+    if params.get('max_weight'):
+        filters['weight__lte'] = _parse_decimal(params, 'max_weight')
+    if params.get('is_active'):
+        filters['is_active'] = _parse_bool(params, 'is_active')
+    return queryset.filter(**filters)
+
+
+def get_jewelry_item_ordering(params):
+    """
+    Return the keyset ordering requested through ?ordering=
+    """
+    value = params.get('ordering') or DEFAULT_JEWELRY_ITEM_ORDERING
+    try:
+        return JEWELRY_ITEM_ORDERINGS[value]
+    except KeyError:
+        raise ValidationError({'ordering': f"Must be one of: {', '.join(JEWELRY_ITEM_ORDERINGS)}"})
@@ -0,0 +1,99 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.fastpath import RowBuilder
+from api.models import Category, JewelryItem, Subcategory
+from api.serializers import JewelryItemSerializer
+from api.slugs import allocate_slugs
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows per second of JewelryItemSerializer(many=True) with the '
+        '.values() fast path used by the product list. A throwaway catalog '
+        'is created and rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000,
+                            help='Items to create and serialize (default: 5000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per path (default: 5)')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            self._create_catalog(rows)
+            queryset = JewelryItem.objects.filter(name__startswith='Bench item ').order_by('-created_at', '-id')
+            builder = RowBuilder(JewelryItemSerializer(many=True))
+
+            def serializer_path():
+                return JewelryItemSerializer(list(queryset), many=True).data
+
+            def fast_path():
+                return builder(queryset.values(*builder.lookups))
+
+            renderer = JSONRenderer()
+            if renderer.render(serializer_path()) != renderer.render(fast_path()):
+                raise CommandError('Fast path output differs from JewelryItemSerializer')
+
+            instances = list(queryset)
+            values = list(queryset.values(*builder.lookups))
+            end_to_end = {
+                'serializer': self._time(serializer_path, repeat),
+                'values() fast path': self._time(fast_path, repeat),
+            }
+            serialize_only = {
+                'serializer': self._time(lambda: JewelryItemSerializer(instances, many=True).data, repeat),
+                'values() fast path': self._time(lambda: builder(values), repeat),
+            }
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{rows} items, best of {repeat} runs, output identical\n')
+        self._report('Query + serialization', end_to_end, rows)
+        self._report('Serialization only', serialize_only, rows)
+
+    def _report(self, title, results, rows):
+        self.stdout.write(title)
+        self.stdout.write(f"  {'path':<20}{'best ms':>10}{'median ms':>11}{'rows/s':>12}")
+        for name, samples in results.items():
+            best = min(samples)
+            self.stdout.write(
+                f'  {name:<20}{best * 1000:>10.1f}{statistics.median(samples) * 1000:>11.1f}'
+                f'{rows / best:>12.0f}'
+            )
+        speedup = min(results['serializer']) / min(results['values() fast path'])
+        self.stdout.write(f'  speedup: {speedup:.1f}x\n')
+
+    def _create_catalog(self, rows):
+        category = Category.objects.create(name='Bench category', slug='bench-category')
+        subcategory = Subcategory.objects.create(name='Bench subcategory', category=category,
+                                                 slug='bench-subcategory')
+        names = [f'Bench item {i}' for i in range(rows)]
+        slugs = allocate_slugs(JewelryItem, names)
+        JewelryItem.objects.bulk_create(
+            [
+                JewelryItem(
+                    name=name, slug=slug, description=f'Description of {name}',
+                    price=Decimal('100.00') + i, weight=Decimal('1.50'),
+                    category=category, subcategory=subcategory,
+                    image_url=f'https://example.com/{slug}.jpg',
+                )
+                for i, (name, slug) in enumerate(zip(names, slugs))
+            ],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def _time(func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return samples
@@ -0,0 +1,184 @@
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from api.caching import bump_generation
+from api.catalog_io import FORMATS, detect_format, read_rows
+from api.models import Category, JewelryItem, Subcategory
+
+# Columns overwritten when a row's slug already exists
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'category', 'subcategory', 'weight',
+    'image_url', 'is_active', 'updated_at',
+]
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert products from a CSV or JSONL catalog, streaming it in batches. '
+        'Rows are matched on slug (derived from the name when blank); '
+        'categories and subcategories are looked up by name or slug.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format (default: from the extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows upserted per transaction (default: 1000)')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Create unknown categories and subcategories instead of skipping the row')
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help='Rejected rows to print (default: 20)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required when reading stdin')
+        try:
+            fmt = detect_format(path, options['format'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        self.verbosity = options['verbosity']
+        self.create_missing = options['create_missing']
+        self.max_errors = options['max_errors']
+        self.errors = 0
+        self._load_categories()
+        self.fields = {name: JewelryItem._meta.get_field(name)
+                       for name in ('name', 'description', 'price', 'weight', 'image_url')}
+        self.slug_field = JewelryItem._meta.get_field('slug')
+
+        start = time.perf_counter()
+        read = upserted = 0
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            batch = {}
+            for line_number, row in read_rows(stream, fmt):
+                read += 1
+                item = self._build_item(line_number, row)
+                if item is None:
+                    continue
+                # A slug repeated within one batch keeps its last row
+                batch[item.slug] = item
+                if len(batch) >= options['batch_size']:
+                    upserted += self._flush(batch)
+                    self._progress(read, start)
+            upserted += self._flush(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if upserted:
+            # bulk_create sends no signals
+            bump_generation(JewelryItem)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Read {read} rows, upserted {upserted}, rejected {self.errors} '
+            f'in {elapsed:.2f}s ({read / elapsed if elapsed else 0:.0f} rows/s)'
+        )
+
+    def _load_categories(self):
+        """
+        Category/subcategory lookup by lowercased name and by slug
+        """
+        self.categories = {}
+        for category in Category.objects.all():
+            self.categories[category.name.lower()] = category
+            self.categories[category.slug] = category
+        self.subcategories = {}
+        for subcategory in Subcategory.objects.all():
+            self.subcategories[subcategory.name.lower()] = subcategory
+            self.subcategories[subcategory.slug] = subcategory
+
+    def _resolve(self, category_name, subcategory_name):
+        category = self.categories.get(category_name.lower()) or self.categories.get(category_name)
+        if category is None:
+            if not self.create_missing:
+                raise ValidationError(f"Unknown category '{category_name}'")
+            category = Category.objects.create(name=category_name)
+            self.categories[category.name.lower()] = self.categories[category.slug] = category
+
+        subcategory = self.subcategories.get(subcategory_name.lower()) or self.subcategories.get(subcategory_name)
+        if subcategory is None:
+            if not self.create_missing:
+                raise ValidationError(f"Unknown subcategory '{subcategory_name}'")
+            subcategory = Subcategory.objects.create(name=subcategory_name, category=category)
+            self.subcategories[subcategory.name.lower()] = self.subcategories[subcategory.slug] = subcategory
+        if subcategory.category_id != category.id:
+            raise ValidationError(f"Subcategory '{subcategory.name}' is not in category '{category.name}'")
+        return category, subcategory
+
+    def _build_item(self, line_number, row):
+        if isinstance(row, Exception):
+            self._reject(line_number, row)
+            return None
+        try:
+            values = {
+                name: field.clean(self._text(row.get(name)), None)
+                for name, field in self.fields.items()
+            }
+            if values['price'] <= 0:
+                raise ValidationError('Price must be a positive number.')
+            category, subcategory = self._resolve(self._text(row.get('category')) or '',
+                                                  self._text(row.get('subcategory')) or '')
+            slug = self._text(row.get('slug')) or slugify(values['name'])
+            if not slug:
+                raise ValidationError('Row has no usable slug or name')
+            self.slug_field.run_validators(slug)
+            is_active = self._bool(row.get('is_active'))
+        except ValidationError as exc:
+            self._reject(line_number, '; '.join(exc.messages))
+            return None
+        return JewelryItem(slug=slug, category=category, subcategory=subcategory, is_active=is_active, **values)
+
+    @staticmethod
+    def _text(value):
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    @staticmethod
+    def _bool(value):
+        if value is None or value == '':
+            return True
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in TRUE_VALUES:
+            return True
+        if str(value).strip().lower() in FALSE_VALUES:
+            return False
+        raise ValidationError(f"is_active must be true or false, got '{value}'")
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            JewelryItem.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=UPDATE_FIELDS,
+            )
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def _reject(self, line_number, reason):
+        self.errors += 1
+        if self.errors <= self.max_errors:
+            self.stderr.write(f'line {line_number}: {reason}')
+
+    def _progress(self, read, start):
+        if self.verbosity >= 2:
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {read} rows, {read / elapsed:.0f} rows/s')
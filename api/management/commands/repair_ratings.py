@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from api.caching import bump_generation
+from api.models import JewelryItem, Review
+
+STARS = range(1, 6)
+RATING_FIELDS = ['rating_count', 'rating_sum', 'average_rating'] + [f'rating_{star}' for star in STARS]
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized rating aggregates on JewelryItem from the '
+        'Review table, one locked batch of items at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Items recomputed per transaction (default: 500)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted items without writing')
+
+    def handle(self, *args, **options):
+        checked = repaired = 0
+        last_pk = None
+        while True:
+            batch = JewelryItem.objects.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            checked += len(pks)
+            repaired += self._repair_batch(pks, options['dry_run'])
+
+        if repaired and not options['dry_run']:
+            bump_generation(JewelryItem)
+        verb = 'would repair' if options['dry_run'] else 'repaired'
+        self.stdout.write(f'Checked {checked} items, {verb} {repaired}')
+
+    def _repair_batch(self, pks, dry_run):
+        with transaction.atomic():
+            # Reviews saved meanwhile wait on these row locks and apply their
+            # F() increments on top of the recomputed values
+            items = list(JewelryItem.objects.select_for_update().filter(pk__in=pks).only('pk', *RATING_FIELDS))
+            aggregates = {
+                row['jewelry_item_id']: row
+                for row in Review.objects.filter(jewelry_item_id__in=pks).values('jewelry_item_id').annotate(
+                    count=Count('id'),
+                    total=Sum('rating'),
+                    **{f'rating_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+                )
+            }
+
+            now = timezone.now()
+            drifted = []
+            for item in items:
+                row = aggregates.get(item.pk)
+                expected = {
+                    'rating_count': row['count'] if row else 0,
+                    'rating_sum': row['total'] if row else 0,
+                    **{f'rating_{star}': row[f'rating_{star}'] if row else 0 for star in STARS},
+                }
+                expected['average_rating'] = (
+                    expected['rating_sum'] / expected['rating_count'] if expected['rating_count'] else 0.0
+                )
+                if any(getattr(item, field) != value for field, value in expected.items()):
+                    for field, value in expected.items():
+                        setattr(item, field, value)
+                    item.updated_at = now
+                    drifted.append(item)
+
+            if drifted and not dry_run:
+                JewelryItem.objects.bulk_update(drifted, RATING_FIELDS + ['updated_at'])
+        return len(drifted)
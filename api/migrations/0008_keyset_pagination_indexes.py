@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_notices_notice_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='jewelryitem',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name_plural': 'Jewelry Items'},
+        ),
+        migrations.AlterModelOptions(
+            name='notices',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['-created_at', '-id'], name='api_jewelry_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notices',
+            index=models.Index(fields=['-created_at', '-id'], name='api_notice_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='api_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='api_review_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['jewelry_item', '-created_at', '-id'], name='api_review_item_created_idx'),
+        ),
+    ]
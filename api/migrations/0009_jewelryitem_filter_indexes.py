@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='api_jewelry_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='api_jewelry_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['subcategory', '-created_at', '-id'], name='api_jewelry_sub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['price', 'id'], name='api_jewelry_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['category', 'price', 'id'], name='api_jewelry_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['subcategory', 'price', 'id'], name='api_jewelry_sub_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['name', 'id'], name='api_jewelry_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['weight'], name='api_jewelry_weight_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = [
+    """
+    ALTER TABLE api_jewelryitem ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX api_jewelry_search_idx ON api_jewelryitem USING GIN (search_vector)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS api_jewelry_search_idx",
+    "ALTER TABLE api_jewelryitem DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        # Other databases use the in-process index in api.search
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_jewelryitem_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run_on_postgresql(SEARCH_VECTOR_SQL), _run_on_postgresql(REVERSE_SQL)),
+    ]
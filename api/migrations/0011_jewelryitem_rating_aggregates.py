@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:44
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    JewelryItem = apps.get_model('api', 'JewelryItem')
+    Review = apps.get_model('api', 'Review')
+    aggregates = Review.objects.values('jewelry_item_id').annotate(
+        count=Count('id'),
+        total=Sum('rating'),
+        **{f'rating_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+    )
+    for row in aggregates.iterator():
+        JewelryItem.objects.filter(pk=row['jewelry_item_id']).update(
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            average_rating=row['total'] / row['count'],
+            **{f'rating_{star}': row[f'rating_{star}'] for star in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_jewelryitem_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='average_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jewelryitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['-average_rating', '-rating_count', '-id'], name='api_jewelry_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
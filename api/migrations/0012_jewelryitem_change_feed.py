@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_jewelryitem_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JewelryItemTombstone',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('slug', models.SlugField()),
+                ('deleted_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitem',
+            index=models.Index(fields=['updated_at', 'id'], name='api_jewelry_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jewelryitemtombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx'),
+        ),
+    ]
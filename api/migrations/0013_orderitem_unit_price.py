@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_prices(apps, schema_editor):
+    # Earlier orders didn't record prices; the current price is the best available
+    JewelryItem = apps.get_model('api', 'JewelryItem')
+    OrderItem = apps.get_model('api', 'OrderItem')
+    OrderItem.objects.filter(unit_price__isnull=True).update(
+        unit_price=Subquery(JewelryItem.objects.filter(pk=OuterRef('jewelry_item_id')).values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_jewelryitem_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_unit_prices, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -2,10 +2,16 @@ from django.db import models
 import uuid
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+from .caching import bump_generation
+from .slugs import save_with_unique_slug
 # Create your models here.
 
 class Category(models.Model):
@@ -13,6 +19,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -20,10 +27,14 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-            # Check if slug already exists for other categories
-            if Category.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                from django.core.exceptions import ValidationError
-                raise ValidationError(f"A category with slug '{self.slug}' already exists.")
+            # The unique constraint catches duplicates; only look when it fires
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if Category.objects.filter(slug=self.slug).exclude(id=self.id).exists():
+                    raise ValidationError(f"A category with slug '{self.slug}' already exists.")
+                raise
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -34,6 +45,7 @@ class Subcategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     category = models.ForeignKey(Category, related_name='subcategories', on_delete=models.CASCADE)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Subcategories"
@@ -41,10 +53,14 @@ class Subcategory(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-            # Check if slug already exists for other subcategories
-            if Subcategory.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                from django.core.exceptions import ValidationError
-                raise ValidationError(f"A subcategory with slug '{self.slug}' already exists.")
+            # The unique constraint catches duplicates; only look when it fires
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if Subcategory.objects.filter(slug=self.slug).exclude(id=self.id).exists():
+                    raise ValidationError(f"A subcategory with slug '{self.slug}' already exists.")
+                raise
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -64,19 +80,42 @@ class JewelryItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Review aggregates, kept current by Review.save and the review post_delete signal
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # rating_sum / rating_count, stored so products can be sorted by it; 0 when unrated
+    average_rating = models.FloatField(default=0)
     
     class Meta:
         verbose_name_plural = "Jewelry Items"
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_jewelry_created_idx'),
+            # Storefront listings only show active items
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='api_jewelry_active_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='api_jewelry_cat_created_idx'),
+            models.Index(fields=['subcategory', '-created_at', '-id'], name='api_jewelry_sub_created_idx'),
+            # Sorting and range filters
+            models.Index(fields=['price', 'id'], name='api_jewelry_price_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='api_jewelry_cat_price_idx'),
+            models.Index(fields=['subcategory', 'price', 'id'], name='api_jewelry_sub_price_idx'),
+            models.Index(fields=['name', 'id'], name='api_jewelry_name_idx'),
+            models.Index(fields=['weight'], name='api_jewelry_weight_idx'),
+            models.Index(fields=['-average_rating', '-rating_count', '-id'], name='api_jewelry_rating_idx'),
+            # Change feed (api.changes)
+            models.Index(fields=['updated_at', 'id'], name='api_jewelry_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
-            # Handle duplicate slugs
-            original_slug = self.slug
-            counter = 1
-            while JewelryItem.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
+            # Next free "-<n>" suffix in one query, retried if a concurrent save wins
+            return save_with_unique_slug(self, lambda: super(JewelryItem, self).save(*args, **kwargs))
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -104,7 +143,7 @@ class CartItem(models.Model):
         unique_together = ['cart', 'jewelry_item']
 
     def __str__(self):
-        return f"CartItem {self.id} in Cart for User {self.cart.user}"
+        return f"CartItem {self.id} in Cart {self.cart_id}"
 
 class Order(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -119,6 +158,13 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_order_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='api_order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} for User {self.user}"
 
@@ -127,6 +173,8 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     jewelry_item = models.ForeignKey(JewelryItem, related_name='order_items', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Product price when the order was placed
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
         return f"OrderItem {self.id} in Order {self.order.id}"
@@ -143,10 +191,68 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ['user', 'jewelry_item']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_review_created_idx'),
+            models.Index(fields=['jewelry_item', '-created_at', '-id'], name='api_review_item_created_idx'),
+        ]
 
     def __str__(self):
         return f"Review {self.id} for Item {self.jewelry_item.name} by User {self.user}"
 
+    # (jewelry_item_id, rating) as counted in the item's aggregates
+    _counted_rating = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'jewelry_item_id' in instance.__dict__ and 'rating' in instance.__dict__:
+            instance._counted_rating = (instance.jewelry_item_id, instance.rating)
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._counted_rating
+            if previous is None and not self._state.adding:
+                previous = Review.objects.filter(pk=self.pk).values_list('jewelry_item_id', 'rating').first()
+            super().save(*args, **kwargs)
+            current = (self.jewelry_item_id, self.rating)
+            if previous != current:
+                if previous is not None:
+                    update_item_rating(*previous, -1)
+                update_item_rating(*current, 1)
+            self._counted_rating = current
+
+
+def update_item_rating(jewelry_item_id, rating, sign):
+    """
+    Add (sign=1) or remove (sign=-1) one rating in a single UPDATE
+
+    F-expressions keep concurrent reviews of the same item from losing
+    each other's updates.
+    """
+    count = F('rating_count') + sign
+    total = F('rating_sum') + sign * rating
+    JewelryItem.objects.filter(pk=jewelry_item_id).update(
+        rating_count=count,
+        rating_sum=total,
+        average_rating=Coalesce(Cast(total, FloatField()) / NullIf(count, 0), 0.0),
+        updated_at=Now(),
+        **{f'rating_{rating}': F(f'rating_{rating}') + sign},
+    )
+    # .update() sends no signals; invalidate once the new numbers are visible
+    transaction.on_commit(lambda: bump_generation(JewelryItem))
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, origin=None, **kwargs):
+    # Deleting an item (or its category) cascades here; the item itself is going too
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if origin_model in (JewelryItem, Category, Subcategory):
+        return
+    counted = instance._counted_rating or (instance.jewelry_item_id, instance.rating)
+    update_item_rating(*counted, -1)
+
 # Signal to automatically create a cart when a user is created
 @receiver(post_save, sender=get_user_model())
 def create_user_cart(sender, instance, created, **kwargs):
@@ -157,10 +263,47 @@ class Notices(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     notice_type =models.CharField(max_length=20, choices=[
         ('offer', 'Offer'),
         ('notice', 'Notice'),
         ('price change', 'Price Change'),
     ], default='info')
 
-   
\ No newline at end of file
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_notice_created_idx'),
+        ]
+
+
+class JewelryItemTombstone(models.Model):
+    """
+    Record of a deleted jewelry item, so the change feed can report it
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    slug = models.SlugField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tombstone for {self.slug}"
+
+
+@receiver(post_delete, sender=JewelryItem)
+def record_jewelry_item_tombstone(sender, instance, **kwargs):
+    JewelryItemTombstone(id=instance.pk, slug=instance.slug, deleted_at=timezone.now()).save()
+
+
+# Invalidate cached catalog and notice responses on every write
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Subcategory)
+@receiver([post_save, post_delete], sender=JewelryItem)
+@receiver([post_save, post_delete], sender=Notices)
+def bump_catalog_generation(sender, **kwargs):
+    bump_generation(sender)
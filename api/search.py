@@ -0,0 +1,154 @@
+"""
+Full-text product search.
+
+On PostgreSQL items are matched against the ``search_vector`` column that
+migration 0010 adds (a stored generated tsvector over name and description,
+backed by a GIN index) and ranked with ``ts_rank_cd``. Other databases fall
+back to an in-process inverted index that is rebuilt whenever the catalog
+generation changes.
+"""
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .caching import get_fingerprint, get_generations, is_shared_cache
+from .models import JewelryItem
+
+SEARCH_CONFIG = 'english'
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return _token_re.findall((text or '').lower())
+
+
+class InvertedIndex:
+    """
+    Term -> {item id: weight} postings for the active catalog
+    """
+
+    def __init__(self, rows=()):
+        self.postings = defaultdict(dict)
+        self.filters = {}
+        for item_id, name, description, category_id, subcategory_id in rows:
+            self.add(item_id, name, description, category_id, subcategory_id)
+
+    def add(self, item_id, name, description, category_id, subcategory_id):
+        self.filters[item_id] = (category_id, subcategory_id)
+        for weight, text in ((NAME_WEIGHT, name), (DESCRIPTION_WEIGHT, description)):
+            for term in tokenize(text):
+                postings = self.postings[term]
+                postings[item_id] = postings.get(item_id, 0.0) + weight
+
+    def search(self, query, category_id=None, subcategory_id=None):
+        """
+        Return item ids matching every query term, best match first.
+
+        The last term also matches as a prefix so results show up while the
+        user is still typing.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        total = len(self.filters) or 1
+        scores = None
+        for i, term in enumerate(terms):
+            if i == len(terms) - 1 and term not in self.postings:
+                matches = {}
+                for candidate in self.postings:
+                    if candidate.startswith(term):
+                        for item_id, weight in self.postings[candidate].items():
+                            matches[item_id] = max(matches.get(item_id, 0.0), weight)
+            else:
+                matches = self.postings.get(term, {})
+            if not matches:
+                return []
+
+            idf = math.log(1 + total / len(matches))
+            if scores is None:
+                scores = {item_id: weight * idf for item_id, weight in matches.items()}
+            else:
+                scores = {
+                    item_id: score + matches[item_id] * idf
+                    for item_id, score in scores.items() if item_id in matches
+                }
+
+        ranked = []
+        for item_id, score in scores.items():
+            item_category, item_subcategory = self.filters[item_id]
+            if category_id is not None and item_category != category_id:
+                continue
+            if subcategory_id is not None and item_subcategory != subcategory_id:
+                continue
+            ranked.append((-score, str(item_id), item_id))
+        ranked.sort()
+        return [item_id for _, _, item_id in ranked]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _catalog_version():
+    """
+    Changes whenever an item is added, edited or removed, in any worker
+    """
+    if is_shared_cache():
+        return get_generations(JewelryItem)
+    # This process's generations miss other workers' writes
+    return get_fingerprint(JewelryItem)
+
+
+def get_inverted_index():
+    """
+    Return the inverted index, rebuilding it if the catalog changed
+    """
+    global _index, _index_version
+    version = _catalog_version()
+    if _index is None or version != _index_version:
+        with _index_lock:
+            if _index is None or version != _index_version:
+                rows = JewelryItem.objects.filter(is_active=True).values_list(
+                    'id', 'name', 'description', 'category_id', 'subcategory_id'
+                )
+                _index = InvertedIndex(rows.iterator(chunk_size=2000))
+                _index_version = version
+    return _index
+
+
+def search_jewelry_items(query, category_id=None, subcategory_id=None, offset=0, limit=20):
+    """
+    Return one page of active items matching ``query``, best match first
+    """
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(query, category_id, subcategory_id, offset, limit)
+
+    ids = get_inverted_index().search(query, category_id, subcategory_id)[offset:offset + limit]
+    items = JewelryItem.objects.in_bulk(ids)
+    return [items[item_id] for item_id in ids if item_id in items]
+
+
+def _search_postgresql(query, category_id, subcategory_id, offset, limit):
+    tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+    queryset = JewelryItem.objects.filter(
+        RawSQL(f'search_vector @@ {tsquery}', (query,), output_field=BooleanField()),
+        is_active=True,
+    )
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    if subcategory_id is not None:
+        queryset = queryset.filter(subcategory_id=subcategory_id)
+    queryset = queryset.annotate(
+        rank=RawSQL(f'ts_rank_cd(search_vector, {tsquery})', (query,), output_field=FloatField())
+    ).order_by('-rank', 'id')
+    return list(queryset[offset:offset + limit])
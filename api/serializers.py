@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from .models import Category, Subcategory, JewelryItem, Cart, CartItem, Order, OrderItem, Review, Notices
+from .fieldsets import DynamicFieldsMixin
 
 User = get_user_model()
 
@@ -11,7 +12,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_active']
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'slug']
@@ -22,8 +23,9 @@ class CategorySerializer(serializers.ModelSerializer):
         return value
 
 
-class SubcategorySerializer(serializers.ModelSerializer):
+class SubcategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
+    expandable_fields = {'category': CategorySerializer}
 
     class Meta:
         model = Subcategory
@@ -41,14 +43,17 @@ class SubcategorySerializer(serializers.ModelSerializer):
         return data
 
 
-class JewelryItemSerializer(serializers.ModelSerializer):
+class JewelryItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
     subcategory = serializers.PrimaryKeyRelatedField(queryset=Subcategory.objects.all())
+    average_rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
+    expandable_fields = {'category': CategorySerializer, 'subcategory': SubcategorySerializer}
 
     class Meta:
         model = JewelryItem
         fields = ['id', 'name', 'description', 'price', 'category', 'subcategory', 'image_url','weight',
-                  'slug', 'created_at', 'updated_at', 'is_active']
+                  'slug', 'created_at', 'updated_at', 'is_active', 'average_rating', 'rating_count']
+        read_only_fields = ['rating_count']
 
     def validate_name(self, value):
         if not value.strip():
@@ -61,7 +66,44 @@ class JewelryItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class JewelryItemBulkSerializer(JewelryItemSerializer):
+    """
+    JewelryItemSerializer for the bulk endpoint
+
+    Category/subcategory ids are checked against maps the caller resolved
+    for the whole request (context['categories'] and
+    context['subcategories']), and slug uniqueness is checked in one query
+    by the caller, so validating an item runs no queries.
+    """
+    category = serializers.UUIDField()
+    subcategory = serializers.UUIDField()
+    slug = serializers.SlugField(max_length=50, required=False, allow_blank=True)
+
+    def validate(self, data):
+        categories = self.context['categories']
+        subcategories = self.context['subcategories']
+        errors = {}
+        if 'category' in data and data['category'] not in categories:
+            errors['category'] = [f'Invalid pk "{data["category"]}" - object does not exist.']
+        if 'subcategory' in data and data['subcategory'] not in subcategories:
+            errors['subcategory'] = [f'Invalid pk "{data["subcategory"]}" - object does not exist.']
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        if 'category' in data or 'subcategory' in data:
+            category_id = data.pop('category', getattr(self.instance, 'category_id', None))
+            subcategory_id = data.pop('subcategory', getattr(self.instance, 'subcategory_id', None))
+            if subcategories.get(subcategory_id) != category_id:
+                raise serializers.ValidationError({'subcategory': ['Subcategory does not belong to the category.']})
+            data['category_id'] = category_id
+            data['subcategory_id'] = subcategory_id
+        if not data.get('slug'):
+            # Blank keeps the current slug, or allocates one for new items
+            data.pop('slug', None)
+        return data
+
+
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     jewelry_item_id = serializers.PrimaryKeyRelatedField(
         source='jewelry_item',
         queryset=JewelryItem.objects.all(),
@@ -81,7 +123,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
 
     class Meta:
@@ -89,12 +131,13 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'created_at', 'updated_at', 'items']
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     jewelry_item = JewelryItemSerializer(read_only=True)
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'order', 'jewelry_item', 'quantity']
+        fields = ['id', 'order', 'jewelry_item', 'quantity', 'unit_price']
+        read_only_fields = ['unit_price']
 
     def validate_quantity(self, value):
         if value <= 0:
@@ -102,7 +145,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
@@ -118,10 +161,11 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     jewelry_item = serializers.PrimaryKeyRelatedField(queryset=JewelryItem.objects.all())
     rating = serializers.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    expandable_fields = {'jewelry_item': JewelryItemSerializer}
 
     class Meta:
         model = Review
@@ -133,7 +177,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return value
 
 
-class NoticesSerializer(serializers.ModelSerializer):
+class NoticesSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notices
         fields = ['id', 'message', 'created_at', 'notice_type']
@@ -0,0 +1,96 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+def _suffix_pattern(base):
+    return re.compile(rf'^{re.escape(base)}-(\d+)$')
+
+
+def next_free_slug(model, base, exclude_pk=None):
+    """
+    Return ``base`` or the next free ``base-<n>`` using a single prefix query
+    """
+    taken = model.objects.filter(Q(slug=base) | Q(slug__startswith=f'{base}-'))
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    return _pick_free(base, taken.values_list('slug', flat=True))
+
+
+def _pick_free(base, taken):
+    pattern = _suffix_pattern(base)
+    base_taken = False
+    highest = 0
+    for slug in taken:
+        if slug == base:
+            base_taken = True
+            continue
+        match = pattern.match(slug)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    if not base_taken:
+        return base
+    return f'{base}-{highest + 1}'
+
+
+def allocate_slugs(model, names, batch_size=200, reserved=()):
+    """
+    Allocate unique slugs for many new rows with one prefix query per batch
+
+    Returns a slug per name, in order, also unique among themselves and
+    distinct from ``reserved`` (slugs about to be written by other rows).
+    Prefixes are queried ``batch_size`` bases at a time so huge imports stay
+    under the database's expression depth limit.
+    """
+    bases = [slugify(name) or 'item' for name in names]
+    wanted = set(bases)
+    unique = sorted(wanted)
+    taken = set(reserved)
+    for start in range(0, len(unique), batch_size):
+        chunk = unique[start:start + batch_size]
+        condition = Q(slug__in=chunk)
+        for base in chunk:
+            condition |= Q(slug__startswith=f'{base}-')
+        taken.update(model.objects.filter(condition).values_list('slug', flat=True))
+
+    # Highest numeric suffix per base, i.e. what _pick_free computes
+    highest = {}
+    for slug in taken:
+        prefix, _, suffix = slug.rpartition('-')
+        if suffix.isdigit() and prefix in wanted:
+            highest[prefix] = max(highest.get(prefix, 0), int(suffix))
+
+    slugs = []
+    for base in bases:
+        slug = base
+        if slug in taken:
+            suffix = highest.get(base, 0)
+            while slug in taken:
+                suffix += 1
+                slug = f'{base}-{suffix}'
+            highest[base] = suffix
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_unique_slug(instance, save, attempts=5):
+    """
+    Give ``instance`` a free slug derived from its name and save it
+
+    Two concurrent saves can pick the same suffix; the unique constraint
+    rejects the loser, which then recomputes the suffix and retries.
+    """
+    model = type(instance)
+    base = slugify(instance.name) or 'item'
+    for attempt in range(attempts):
+        instance.slug = next_free_slug(model, base, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            lost_race = model.objects.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if not lost_race or attempt == attempts - 1:
+                raise
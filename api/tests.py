@@ -1,3 +1,1071 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError as ModelValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import caching, cart_store
+from .caching import MODIFIED_KEY, bump_generation, choose_encoding
+from .checks import check_cart_store
+from .fastpath import RowBuilder
+from .filters import filter_jewelry_items, get_jewelry_item_ordering, parse_uuid_list
+from .models import Category, Subcategory, JewelryItem, Cart, CartItem, Notices, Order, OrderItem, Review
+from .slugs import allocate_slugs, next_free_slug, save_with_unique_slug
+from .serializers import JewelryItemSerializer, NoticesSerializer, ReviewSerializer
+from .views import ReviewViewSet
+
+
+# Visible to every process on the host, unlike the LocMemCache default
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'sj-backend-test-cache'),
+}}
+
+
+class JewelryItemQueryPlanTests(TestCase):
+    """
+    Products endpoint filters and sorts must be served by an index,
+    never by a sequential scan of the catalog.
+    """
+    catalog_size = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(4)]
+        subcategories = [
+            Subcategory.objects.create(name=f'Subcategory {i}', category=categories[i % 4])
+            for i in range(12)
+        ]
+        JewelryItem.objects.bulk_create([
+            JewelryItem(
+                name=f'Item {i}',
+                slug=f'item-{i}',
+                description='Synthetic catalog item',
+                price=Decimal(50 + (i * 37) % 5000),
+                weight=Decimal((i * 13) % 900) / 10,
+                category=subcategories[i % 12].category,
+                subcategory=subcategories[i % 12],
+                is_active=i % 10 != 0,
+            )
+            for i in range(cls.catalog_size)
+        ], batch_size=500)
+        cls.category = categories[1]
+        cls.subcategory = subcategories[5]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def plan(self, query):
+        params = QueryDict(query)
+        queryset = filter_jewelry_items(JewelryItem.objects.all(), params)
+        ordering = get_jewelry_item_ordering(params)
+        return queryset.order_by(*ordering)[:21].explain()
+
+    def assertNoSequentialScan(self, query):
+        plan = self.plan(query)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan, msg=f'{query}:\n{plan}')
+        else:
+            for line in plan.splitlines():
+                scan = 'SCAN api_jewelryitem' in line and 'USING' not in line
+                self.assertFalse(scan, msg=f'{query}:\n{plan}')
+
+    def test_default_listing(self):
+        self.assertNoSequentialScan('')
+        self.assertNoSequentialScan('is_active=true')
+
+    def test_filters(self):
+        for query in [
+            f'category={self.category.id}',
+            f'subcategory={self.subcategory.id}',
+            'slug=item-42',
+            'min_price=100&max_price=200',
+            'min_weight=10&max_weight=12',
+            f'category={self.category.id}&is_active=true',
+            f'subcategory={self.subcategory.id}&min_price=1000',
+        ]:
+            with self.subTest(query=query):
+                self.assertNoSequentialScan(query)
+
+    def test_sorting(self):
+        for ordering in ['price', '-price', 'created_at', '-created_at', 'name', '-name', 'rating', '-rating']:
+            with self.subTest(ordering=ordering):
+                self.assertNoSequentialScan(f'ordering={ordering}')
+                self.assertNoSequentialScan(f'ordering={ordering}&category={self.category.id}')
+
+
+class CatalogFixtureMixin:
+    """
+    A small catalog and a customer with a cart, shared by the API tests below
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Rings')
+        cls.subcategory = Subcategory.objects.create(name='Gold Rings', category=cls.category)
+        cls.items = [
+            JewelryItem.objects.create(
+                name=f'Ring {i}', price=Decimal(100 * (i + 1)), weight=Decimal('2.50'),
+                category=cls.category, subcategory=cls.subcategory,
+            )
+            for i in range(3)
+        ]
+        cls.customer = get_user_model().objects.create(email='customer@example.com', role='customer')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+
+class SparseFieldsetTests(CatalogFixtureMixin, TestCase):
+    """
+    ?fields= must combine with the prefetches and joins views set up themselves
+    """
+
+    def setUp(self):
+        super().setUp()
+        for item in self.items[:2]:
+            CartItem.objects.create(cart=self.customer.cart, jewelry_item=item, quantity=2)
+
+    def test_cart_nested_fields(self):
+        response = self.client.get('/api/cart/?fields=id,items.quantity')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'id': str(self.customer.cart.id), 'items': [{'quantity': 2}] * 2}])
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cart/?fields=id,items.jewelry_item.name')
+        self.assertEqual(response.status_code, 200)
+        names = {line['jewelry_item']['name'] for line in response.json()[0]['items']}
+        self.assertEqual(names, {'Ring 0', 'Ring 1'})
+
+    def test_cart_items_fields(self):
+        response = self.client.get('/api/cart-items/?fields=id,quantity')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line['quantity'] for line in response.json()], [2, 2])
+
+    def test_order_nested_fields(self):
+        order = Order.objects.create(user=self.customer, total_amount=Decimal('100.00'))
+        OrderItem.objects.create(order=order, jewelry_item=self.items[0], quantity=3, unit_price=Decimal('100.00'))
+        response = self.client.get('/api/orders/?fields=id,items.quantity')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': str(order.id), 'items': [{'quantity': 3}]}])
+
+    def test_reviews_fields(self):
+        Review.objects.create(user=self.customer, jewelry_item=self.items[0], rating=4)
+        response = self.client.get('/api/reviews/?fields=id,rating')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([review['rating'] for review in response.json()['results']], [4])
+
+
+class CheckoutTests(CatalogFixtureMixin, TestCase):
+    """
+    Orders are built atomically from the cart, with prices snapshotted per line
+    """
+
+    def setUp(self):
+        super().setUp()
+        CartItem.objects.create(cart=self.customer.cart, jewelry_item=self.items[0], quantity=2)
+        CartItem.objects.create(cart=self.customer.cart, jewelry_item=self.items[1], quantity=1)
+
+    def test_snapshot_and_total(self):
+        with mock.patch('api.views.send_order_confirmation_email') as send:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.client.post('/api/orders/', {}, format='json')
+                self.assertFalse(send.called)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+        order = Order.objects.get(pk=response.json()['id'])
+        send.assert_called_once_with(order)
+
+        self.assertEqual(order.total_amount, Decimal('400.00'))
+        lines = {line.jewelry_item_id: line for line in order.items.all()}
+        self.assertEqual(lines[self.items[0].id].unit_price, Decimal('100.00'))
+        self.assertEqual(lines[self.items[1].id].unit_price, Decimal('200.00'))
+        self.assertEqual(order.total_amount, sum(line.quantity * line.unit_price for line in lines.values()))
+        self.assertFalse(CartItem.objects.filter(cart=self.customer.cart).exists())
+
+        # Later price changes don't touch placed orders
+        JewelryItem.objects.filter(pk=self.items[0].pk).update(price=Decimal('999.00'))
+        response = self.client.get(f'/api/orders/{order.id}/')
+        prices = {line['jewelry_item']['id']: line['unit_price'] for line in response.json()['items']}
+        self.assertEqual(prices[str(self.items[0].id)], '100.00')
+
+    def test_failure_rolls_back(self):
+        with mock.patch('api.views.send_order_confirmation_email') as send, \
+                mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError):
+                    self.client.post('/api/orders/', {}, format='json')
+        self.assertFalse(send.called)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.customer.cart).count(), 2)
+
+    def test_empty_cart(self):
+        CartItem.objects.filter(cart=self.customer.cart).delete()
+        response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(CART_STORE='cache', CACHES=SHARED_CACHES)
+@mock.patch.object(cart_store.CartSync, '_run', lambda self: None)
+class CacheCartStoreTests(CatalogFixtureMixin, TestCase):
+    """
+    With CART_STORE='cache' the cart lives in the cache until CartSync writes it back
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.cart = self.customer.cart
+        CartItem.objects.create(cart=self.cart, jewelry_item=self.items[0], quantity=1)
+
+    def rows(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('jewelry_item_id', 'quantity'))
+
+    def test_writes_stay_in_cache_until_flushed(self):
+        response = self.client.post('/api/cart-items/bulk_add/', {'items': [
+            {'jewelry_item_id': str(self.items[0].id), 'quantity': 2},
+            {'jewelry_item_id': str(self.items[1].id), 'quantity': 3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rows(), {self.items[0].id: 1})
+
+        response = self.client.get('/api/cart/')
+        quantities = {line['jewelry_item']['id']: line['quantity'] for line in response.json()[0]['items']}
+        self.assertEqual(quantities, {str(self.items[0].id): 3, str(self.items[1].id): 3})
+        self.assertEqual(self.client.get('/api/cart/summary/').json(),
+                         {'line_count': 2, 'item_count': 6, 'subtotal': '900.00'})
+
+        self.assertEqual(cart_store.cart_sync.pending_count(), 1)
+        self.assertEqual(cart_store.cart_sync.flush(), 1)
+        self.assertEqual(cart_store.cart_sync.pending_count(), 0)
+        self.assertEqual(self.rows(), {self.items[0].id: 3, self.items[1].id: 3})
+
+    def test_removals_are_flushed(self):
+        line = self.client.get('/api/cart-items/').json()[0]
+        self.assertEqual(self.client.delete(f"/api/cart-items/{line['id']}/").status_code, 204)
+        self.assertEqual(self.rows(), {self.items[0].id: 1})
+        cart_store.cart_sync.flush()
+        self.assertEqual(self.rows(), {})
+
+    def test_checkout_flushes_first(self):
+        self.client.post('/api/cart-items/', {'jewelry_item_id': str(self.items[1].id), 'quantity': 2}, format='json')
+        with mock.patch('api.views.send_order_confirmation_email'):
+            response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        lines = {line['jewelry_item']['id']: line['quantity'] for line in response.json()['items']}
+        self.assertEqual(lines, {str(self.items[0].id): 1, str(self.items[1].id): 2})
+        self.assertEqual(self.rows(), {})
+        self.assertEqual(self.client.get('/api/cart/summary/').json()['line_count'], 0)
+
+    @mock.patch.object(cart_store, 'LOCK_WAIT', 0.05)
+    def test_busy_cart_is_409(self):
+        line = self.client.get('/api/cart-items/').json()[0]
+        cache.add(cart_store.LOCK_KEY.format(self.customer.id), 'other request')
+        self.assertEqual(self.client.delete(f"/api/cart-items/{line['id']}/").status_code, 409)
+        response = self.client.patch(f"/api/cart-items/{line['id']}/update_quantity/", {'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_missing_cart_is_404(self):
+        line = self.client.get('/api/cart-items/').json()[0]
+        cache.clear()
+        Cart.objects.filter(user=self.customer).delete()
+        self.assertEqual(self.client.get(f"/api/cart-items/{line['id']}/").status_code, 404)
+        self.assertEqual(self.client.get('/api/cart-items/').status_code, 404)
+        self.assertEqual(self.client.get('/api/cart/').json(), [])
+
+
+class SharedCacheGuardTests(CatalogFixtureMixin, TestCase):
+    """
+    Caches other workers can't see are not used for catalog responses or carts
+    """
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_catalog_uncached_on_local_memory(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_catalog_cached_on_shared_backend(self):
+        cache.clear()
+        self.assertEqual(self.client.get('/api/products/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/products/')['X-Cache'], 'HIT')
+
+    @override_settings(CART_STORE='cache')
+    def test_cache_cart_store_needs_shared_backend(self):
+        self.assertEqual([error.id for error in check_cart_store(None)], ['api.E001'])
+        with self.assertRaises(ImproperlyConfigured):
+            cart_store.get_cart_store()
+        with override_settings(CACHES=SHARED_CACHES):
+            self.assertEqual(check_cart_store(None), [])
+            self.assertIs(cart_store.get_cart_store(), cart_store.cache_store)
+
+
+class CartAddTests(CatalogFixtureMixin, TestCase):
+    """
+    Adds upsert into the cart in one statement and validate before writing
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.cart = self.customer.cart
+
+    def add(self, items):
+        return self.client.post('/api/cart-items/bulk_add/', {'items': items}, format='json')
+
+    def rows(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('jewelry_item_id', 'quantity'))
+
+    def test_existing_line_is_incremented(self):
+        product = str(self.items[0].id)
+        self.client.post('/api/cart-items/', {'jewelry_item_id': product, 'quantity': 2}, format='json')
+        response = self.add([{'jewelry_item_id': product, 'quantity': 3}, {'jewelry_item_id': product}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line['quantity'] for line in response.json()['results']], [6])
+        self.assertEqual(self.rows(), {self.items[0].id: 6})
+
+    def test_unknown_or_inactive_product_writes_nothing(self):
+        JewelryItem.objects.filter(pk=self.items[1].pk).update(is_active=False)
+        for missing in (str(self.items[1].id), '00000000-0000-0000-0000-000000000000'):
+            response = self.add([
+                {'jewelry_item_id': str(self.items[0].id), 'quantity': 1},
+                {'jewelry_item_id': missing, 'quantity': 1},
+            ])
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(missing, response.json()['detail'])
+        self.assertEqual(self.rows(), {})
+
+    def test_invalid_quantities_are_rejected(self):
+        product = str(self.items[0].id)
+        for quantity in (0, -1, 'two', True, 1.5, None):
+            with self.subTest(quantity=quantity):
+                self.assertEqual(self.add([{'jewelry_item_id': product, 'quantity': quantity}]).status_code, 400)
+        for quantity in (0, -3):
+            response = self.client.post('/api/cart-items/', {'jewelry_item_id': product, 'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, 400)
+        for items in ([], [{'jewelry_item_id': 'not-a-uuid'}], [product], 'x'):
+            with self.subTest(items=items):
+                self.assertEqual(self.add(items).status_code, 400)
+        self.assertEqual(self.rows(), {})
+
+
+class BulkOperationsTests(CatalogFixtureMixin, TestCase):
+    """
+    Bulk writes apply all operations or none
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.owner = get_user_model().objects.create(auth0_id='owner', email='owner@example.com', role='owner')
+        self.client.force_authenticate(self.owner)
+
+    def new_item(self):
+        return {'name': 'New', 'price': '10.00', 'weight': '1.00',
+                'category': str(self.category.id), 'subcategory': str(self.subcategory.id)}
+
+    def bulk(self, operations):
+        return self.client.post('/api/products/bulk/', {'operations': operations}, format='json')
+
+    def prices(self):
+        return [JewelryItem.objects.get(pk=item.pk).price for item in self.items]
+
+    def test_invalid_operation_applies_nothing(self):
+        response = self.bulk([
+            {'op': 'update', 'id': str(self.items[0].id), 'data': {'price': '150.00'}},
+            {'op': 'update', 'id': str(self.items[1].id), 'data': {'price': 'cheap'}},
+            {'op': 'delete', 'id': str(self.items[2].id)},
+            {'op': 'create', 'data': self.new_item()},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']],
+                         ['valid', 'error', 'valid', 'valid'])
+        self.assertEqual(self.prices(), [Decimal('100.00'), Decimal('200.00'), Decimal('300.00')])
+        self.assertEqual(JewelryItem.objects.count(), 3)
+
+    def test_conflict_is_409_and_rolls_back(self):
+        operations = [
+            {'op': 'update', 'id': str(self.items[0].id), 'data': {'price': '150.00'}},
+            {'op': 'create', 'data': self.new_item()},
+        ]
+        with mock.patch.object(JewelryItem.objects, 'bulk_create', side_effect=IntegrityError('duplicate key')):
+            response = self.bulk(operations)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.prices()[0], Decimal('100.00'))
+
+        # An update target deleted after validation
+        def delete_target(creates, updates):
+            JewelryItem.objects.filter(pk=self.items[0].pk).delete()
+            return False
+        with mock.patch('api.bulk._check_slugs', side_effect=delete_target):
+            response = self.bulk(operations)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(JewelryItem.objects.count(), 2)
+
+    def test_concurrent_edits_to_other_fields_survive(self):
+        def concurrent_edit(creates, updates):
+            JewelryItem.objects.filter(pk=self.items[0].pk).update(price=Decimal('111.00'))
+            return False
+        with mock.patch('api.bulk._check_slugs', side_effect=concurrent_edit):
+            response = self.bulk([
+                {'op': 'update', 'id': str(self.items[0].id), 'data': {'name': 'Renamed'}},
+                {'op': 'update', 'id': str(self.items[1].id), 'data': {'price': '250.00'}},
+            ])
+        self.assertEqual(response.status_code, 200)
+        item = JewelryItem.objects.get(pk=self.items[0].pk)
+        self.assertEqual((item.name, item.price), ('Renamed', Decimal('111.00')))
+        self.assertEqual(response.json()['results'][0]['item']['price'], '111.00')
+        self.assertEqual(self.prices()[1], Decimal('250.00'))
+
+
+class KeysetPaginationTests(CatalogFixtureMixin, TestCase):
+    """
+    Cursor pages are seeked on the ordering, so they neither skip nor repeat rows
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(3, 8):
+            JewelryItem.objects.create(
+                name=f'Ring {i}', price=Decimal(100 * (i + 1)), weight=Decimal('2.50'),
+                category=cls.category, subcategory=cls.subcategory,
+            )
+        # Ties on created_at are broken by id
+        JewelryItem.objects.filter(name__in=['Ring 2', 'Ring 3', 'Ring 4']).update(created_at=cls.items[2].created_at)
+
+    def walk(self, url):
+        ids, previous, query_counts = [], None, set()
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            query_counts.add(len(queries))
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 3)
+            ids.extend(item['id'] for item in page['results'])
+            self.assertEqual(page['previous'] is None, previous is None)
+            previous, url = url, page['next']
+        # A deep page costs the same as the first one
+        self.assertEqual(len(query_counts), 1)
+        return ids
+
+    def test_walk_visits_every_row_once_in_order(self):
+        expected = [str(pk) for pk in JewelryItem.objects.order_by('-created_at', '-id').values_list('id', flat=True)]
+        self.assertEqual(self.walk('/api/products/?page_size=3'), expected)
+        by_price = [str(pk) for pk in JewelryItem.objects.order_by('price', 'id').values_list('id', flat=True)]
+        self.assertEqual(self.walk('/api/products/?page_size=3&ordering=price'), by_price)
+
+    def test_pages_are_stable_under_inserts(self):
+        first = self.client.get('/api/products/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        JewelryItem.objects.create(name='Newest', price=Decimal('1.00'), category=self.category, subcategory=self.subcategory)
+        self.assertEqual(self.client.get(first['next']).json()['results'], second['results'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([item['id'] for item in back['results']], [item['id'] for item in first['results']])
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/products/?cursor=garbage').status_code, 404)
+
+
+class RatingAggregateTests(CatalogFixtureMixin, TestCase):
+    """
+    The stored rating aggregates follow every review write
+    """
+
+    def assertAggregates(self, item, ratings):
+        item = JewelryItem.objects.get(pk=item.pk)
+        self.assertEqual(sorted(Review.objects.filter(jewelry_item=item).values_list('rating', flat=True)), sorted(ratings))
+        self.assertEqual((item.rating_count, item.rating_sum), (len(ratings), sum(ratings)))
+        self.assertEqual([getattr(item, f'rating_{star}') for star in range(1, 6)],
+                         [ratings.count(star) for star in range(1, 6)])
+        self.assertAlmostEqual(item.average_rating, sum(ratings) / len(ratings) if ratings else 0)
+
+    def test_create_update_delete(self):
+        first, second = self.items[:2]
+        other = get_user_model().objects.create(auth0_id='other', email='other@example.com', role='customer')
+        Review.objects.create(user=other, jewelry_item=first, rating=2)
+
+        response = self.client.post('/api/reviews/', {'jewelry_item': str(first.id), 'rating': 4}, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/reviews/{response.json()['id']}/"
+        self.assertAggregates(first, [2, 4])
+
+        self.client.patch(url, {'rating': 5}, format='json')
+        self.assertAggregates(first, [2, 5])
+
+        # Moving the review takes its rating along
+        self.client.patch(url, {'jewelry_item': str(second.id)}, format='json')
+        self.assertAggregates(first, [2])
+        self.assertAggregates(second, [5])
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertAggregates(second, [])
+
+        # Reviews removed by cascade are subtracted too
+        other.delete()
+        self.assertAggregates(first, [])
+
+    def test_item_cascade_skips_recount(self):
+        doomed, kept = self.items[:2]
+        users = [get_user_model().objects.create(auth0_id=f'user-{n}', email=f'user{n}@example.com')
+                 for n in range(3)]
+        for user in users:
+            Review.objects.create(user=user, jewelry_item=doomed, rating=5)
+        Review.objects.create(user=users[0], jewelry_item=kept, rating=3)
+
+        for delete in (doomed.delete, Category.objects.filter(pk=self.category.pk).delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "api_jewelryitem" ')]
+            self.assertEqual(updates, [])
+        self.assertFalse(Review.objects.exists())
+
+
+@mock.patch('api.changes.SETTLE_SECONDS', 0)
+class ChangeFeedTests(CatalogFixtureMixin, TestCase):
+    """
+    The NDJSON feed replays upserts and deletes after a cursor exactly once
+    """
+
+    def feed(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get('/api/products/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[-1]['type'], 'cursor')
+        return lines[:-1], lines[-1]
+
+    def test_changes_after_cursor(self):
+        changes, cursor = self.feed()
+        self.assertEqual({change['item']['id'] for change in changes}, {str(item.id) for item in self.items})
+        self.assertFalse(cursor['has_more'])
+
+        deleted, updated = self.items[0], self.items[1]
+        deleted_id = str(deleted.id)
+        deleted.delete()
+        updated.price = Decimal('250.00')
+        updated.save()
+
+        changes, cursor = self.feed(cursor['cursor'])
+        self.assertEqual([change['type'] for change in changes], ['delete', 'upsert'])
+        self.assertEqual((changes[0]['id'], changes[0]['slug']), (deleted_id, deleted.slug))
+        self.assertEqual((changes[1]['item']['id'], changes[1]['item']['price']), (str(updated.id), '250.00'))
+
+        # Nothing new: the cursor stays put
+        changes, again = self.feed(cursor['cursor'])
+        self.assertEqual((changes, again['cursor']), ([], cursor['cursor']))
+
+    def test_limit_pages_through_changes(self):
+        ids = [str(item.id) for item in self.items]
+        JewelryItem.objects.get(pk=ids[2]).delete()
+        seen, since = [], None
+        while True:
+            changes, cursor = self.feed(since, limit=1)
+            seen.extend(change.get('id') or change['item']['id'] for change in changes)
+            since = cursor['cursor']
+            if not cursor['has_more']:
+                break
+        # The deleted item only as its tombstone, which is newer than the rest
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(seen[-1], ids[2])
+
+    def test_unsettled_changes_are_held_back(self):
+        _, cursor = self.feed()
+        self.items[0].save()
+        with mock.patch('api.changes.SETTLE_SECONDS', 60):
+            changes, held = self.feed(cursor['cursor'])
+        self.assertEqual((changes, held['cursor']), ([], cursor['cursor']))
+        self.assertEqual(len(self.feed(cursor['cursor'])[0]), 1)
+
+    def test_invalid_cursor_is_400(self):
+        self.assertEqual(self.client.get('/api/products/changes/', {'since': 'garbage'}).status_code, 400)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ConditionalRequestTests(CatalogFixtureMixin, TestCase):
+    """
+    Whole-second Last-Modified never hides a write made within the same second
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def set_modified(self, timestamp):
+        cache.set(MODIFIED_KEY.format(JewelryItem._meta.label_lower), timestamp, None)
+
+    def test_last_modified_waits_for_the_second_to_pass(self):
+        bump_generation(JewelryItem)
+        response = self.client.get('/api/products/')
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        written = time.time() - 10.5
+        self.set_modified(written)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['Last-Modified'], http_date(int(written)))
+        last_modified, etag = response['Last-Modified'], response['ETag']
+
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+        bump_generation(JewelryItem)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BatchRatingsTests(CatalogFixtureMixin, TestCase):
+    """
+    /products/ratings/ takes a comma-separated id list
+    """
+
+    def test_parse_uuid_list(self):
+        first, second = (str(item.id) for item in self.items[:2])
+        self.assertEqual(parse_uuid_list(f' {first},,{second} ,'), [self.items[0].id, self.items[1].id])
+        self.assertEqual(parse_uuid_list(None), [])
+        with self.assertRaises(ValidationError):
+            parse_uuid_list(f'{first},nope')
+
+    def test_ratings(self):
+        Review.objects.create(user=self.customer, jewelry_item=self.items[0], rating=4)
+        first, second = (str(item.id) for item in self.items[:2])
+        response = self.client.get('/api/products/ratings/', {'ids': f'{second}, {first},{second}'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [second, first])
+        self.assertEqual(response.json()['results'][1]['histogram']['4'], 1)
+
+        response = self.client.get('/api/products/ratings/', {'ids': f'{first},nope'})
+        self.assertEqual((response.status_code, list(response.json())), (400, ['ids']))
+        self.assertEqual(self.client.get('/api/products/ratings/').status_code, 400)
+
+
+class LocalConditionalRequestTests(CatalogFixtureMixin, TestCase):
+    """
+    On the per-process default cache, validators come from the database
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.written = timezone.now() - timedelta(hours=1)
+        for model in (Category, Subcategory, JewelryItem):
+            model.objects.update(updated_at=self.written)
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response['Last-Modified'], http_date(int(self.written.timestamp())))
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get('/api/products/?ordering=price', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.items[0].save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_writes_change_the_validator(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        Category.objects.filter(pk=self.category.pk).update(name='Bands', updated_at=timezone.now())
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        notice = Notices.objects.create(message='Closed on Sunday', notice_type='notice')
+        etag = self.client.get('/api/notices/')['ETag']
+        notice.delete()
+        self.assertEqual(self.client.get('/api/notices/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ExpandedPayloadCacheTests(CatalogFixtureMixin, TestCase):
+    """
+    Expanded relations are part of the cached representation
+    """
+
+    def rename_category(self):
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = 'Bands'
+        category.save()
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_cached_body_follows_expanded_models(self):
+        cache.clear()
+        url = '/api/products/?expand=category,subcategory.category&fields=id,category.name,subcategory.category.name'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['results'][0]['category'], {'name': 'Rings'})
+
+        self.rename_category()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['category'], {'name': 'Bands'})
+        self.assertEqual(response.json()['results'][0]['subcategory'], {'category': {'name': 'Bands'}})
+        subcategory, = self.client.get('/api/subcategories/?expand=category').json()
+        self.assertEqual(subcategory['category']['name'], 'Bands')
+
+    def test_etag_follows_expanded_models(self):
+        Category.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        etag = self.client.get('/api/products/?expand=category')['ETag']
+        self.rename_category()
+        response = self.client.get('/api/products/?expand=category', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['category']['name'], 'Bands')
+
+
+class PrecompressedResponseTests(CatalogFixtureMixin, TestCase):
+    """
+    Stored encodings are negotiated from Accept-Encoding and validated per encoding
+    """
+
+    @mock.patch.object(caching, 'ENCODERS', {'br': None, 'gzip': None})
+    def test_choose_encoding(self):
+        cases = {
+            '': 'identity',
+            'gzip': 'gzip',
+            'gzip, br': 'br',
+            'br;q=0.5, gzip': 'gzip',
+            'GZIP;Q=0.8, br;q=0.3': 'gzip',
+            '*': 'br',
+            '*;q=0.1, gzip;q=0.5': 'gzip',
+            'gzip;q=0.2, identity;q=0': 'gzip',
+            'br;q=0, gzip;q=0, identity;q=0': 'identity',
+            'gzip;q=bogus': 'identity',
+            'deflate': 'identity',
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_gzip_variant(self):
+        cache.clear()
+        plain = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='identity')
+        self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        # One ETag per encoding; each only validates its own representation
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        stale = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(stale.status_code, 200)
+        not_modified = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+
+
+class RowBuilderParityTests(CatalogFixtureMixin, TestCase):
+    """
+    The .values() fast path renders the same bytes as the serializers it stands in for
+    """
+
+    def assertSameJSON(self, serializer_class, queryset, overrides=None):
+        builder = RowBuilder(serializer_class(many=True), overrides)
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(list(queryset), many=True).data)
+        self.assertEqual(renderer.render(builder(queryset.values(*builder.lookups))), expected)
+
+    def test_products(self):
+        JewelryItem.objects.create(
+            name='Bare', price=Decimal('0.10'), weight=None, description=None, image_url=None,
+            category=self.category, subcategory=self.subcategory,
+        )
+        JewelryItem.objects.filter(pk=self.items[0].pk).update(
+            price=Decimal('1234567.89'), description='Twisted band', image_url='https://img.example/ring.jpg',
+            rating_count=3, rating_sum=13, average_rating=13 / 3,
+        )
+        self.assertSameJSON(JewelryItemSerializer, JewelryItem.objects.order_by('-created_at', '-id'))
+
+    def test_reviews(self):
+        other = get_user_model().objects.create(auth0_id='other', email='other@example.com', role='customer')
+        Review.objects.create(user=self.customer, jewelry_item=self.items[0], rating=5, comment='Lovely ring')
+        Review.objects.create(user=other, jewelry_item=self.items[1], rating=1, comment=None)
+        self.assertSameJSON(ReviewSerializer, Review.objects.select_related('user'), ReviewViewSet.values_overrides)
+
+    def test_notices(self):
+        Notices.objects.create(message='Closed on Sunday', notice_type='notice')
+        Notices.objects.create(message='Gold rate changed', notice_type='price change')
+        self.assertSameJSON(NoticesSerializer, Notices.objects.all())
+
+
+class SearchTests(CatalogFixtureMixin, TestCase):
+    """
+    Search ranks name matches first and honours filters and paging (fallback index here)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_category = Category.objects.create(name='Necklaces')
+        cls.other_subcategory = Subcategory.objects.create(name='Chains', category=cls.other_category)
+
+        def item(name, description=None, category=None, subcategory=None, **kwargs):
+            return JewelryItem.objects.create(
+                name=name, description=description, price=Decimal('50.00'),
+                category=category or cls.category, subcategory=subcategory or cls.subcategory, **kwargs,
+            )
+        cls.named = item('Emerald Halo', 'Platinum band')
+        cls.described = item('Solitaire', 'Set with a small emerald accent')
+        cls.chain = item('Emerald Chain', category=cls.other_category, subcategory=cls.other_subcategory)
+        cls.hidden = item('Emerald Hidden', is_active=False)
+
+    def search(self, **params):
+        return self.client.get('/api/products/search/', params)
+
+    def ids(self, **params):
+        response = self.search(**params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_name_ranks_above_description_and_inactive_is_excluded(self):
+        found = self.ids(q='emerald')
+        self.assertEqual(set(found), {str(self.named.id), str(self.described.id), str(self.chain.id)})
+        self.assertEqual(found[-1], str(self.described.id))
+
+    def test_prefix_on_last_term(self):
+        self.assertEqual(self.ids(q='emer halo'), [])
+        self.assertEqual(self.ids(q='emerald ha'), [str(self.named.id)])
+        self.assertEqual(set(self.ids(q='soli')), {str(self.described.id)})
+
+    def test_filters(self):
+        self.assertEqual(self.ids(q='emerald', category=str(self.other_category.id)), [str(self.chain.id)])
+        self.assertEqual(set(self.ids(q='emerald', subcategory=str(self.subcategory.id))),
+                         {str(self.named.id), str(self.described.id)})
+        self.assertEqual(self.search(q='emerald', category='nope').status_code, 400)
+
+    def test_paging(self):
+        first = self.search(q='emerald', page_size=2).json()
+        self.assertEqual((len(first['results']), first['previous']), (2, None))
+        second = self.client.get(first['next']).json()
+        self.assertEqual((len(second['results']), second['next']), (1, None))
+        self.assertIsNotNone(second['previous'])
+        seen = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(seen, self.ids(q='emerald'))
+        self.assertEqual(self.search(q='emerald', page='x').status_code, 400)
+
+    def test_query_required(self):
+        self.assertEqual(self.search().status_code, 400)
+        self.assertEqual(self.search(q='   ').status_code, 400)
+
+    def test_index_follows_catalog_changes(self):
+        self.assertEqual(self.ids(q='sapphire'), [])
+        # bulk_create sends no signals, like a write made by another worker
+        sapphire, = JewelryItem.objects.bulk_create([JewelryItem(
+            name='Sapphire Drop', price=Decimal('70.00'), slug='sapphire-drop',
+            category=self.category, subcategory=self.subcategory,
+        )])
+        self.assertEqual(self.ids(q='sapphire'), [str(sapphire.id)])
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CategoryTreeTests(CatalogFixtureMixin, TestCase):
+    """
+    The navigation tree is one query and counts only active items
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        JewelryItem.objects.filter(pk=cls.items[0].pk).update(is_active=False)
+        cls.empty_subcategory = Subcategory.objects.create(name='Silver Rings', category=cls.category)
+        cls.empty_category = Category.objects.create(name='Anklets')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_cold_cache_is_one_query(self):
+        # Last-Modified is seeded from the database once per cache lifetime, not per response
+        caching.get_last_modified(Category, Subcategory, JewelryItem)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/categories/tree/')
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+        with self.assertNumQueries(0):
+            self.client.get('/api/categories/tree/')
+
+    def test_counts(self):
+        tree = {node['name']: node for node in self.client.get('/api/categories/tree/').json()}
+        self.assertEqual(list(tree), ['Anklets', 'Rings'])
+        self.assertEqual((tree['Anklets']['active_items'], tree['Anklets']['subcategories']), (0, []))
+        rings = tree['Rings']
+        self.assertEqual(rings['active_items'], 2)
+        self.assertEqual(
+            [(sub['name'], sub['active_items']) for sub in rings['subcategories']],
+            [('Gold Rings', 2), ('Silver Rings', 0)],
+        )
+
+
+class SlugTests(CatalogFixtureMixin, TestCase):
+    """
+    Generated slugs take the next free numeric suffix and resolve on the slug routes
+    """
+
+    def item(self, name, **kwargs):
+        return JewelryItem(name=name, price=Decimal('10.00'), category=self.category,
+                           subcategory=self.subcategory, **kwargs)
+
+    def test_collisions_get_suffixes(self):
+        first, second, third = (self.item('Twist Band') for _ in range(3))
+        for item in (first, second, third):
+            item.save()
+        self.assertEqual([first.slug, second.slug, third.slug], ['twist-band', 'twist-band-1', 'twist-band-2'])
+        self.assertEqual(next_free_slug(JewelryItem, 'twist-band'), 'twist-band-3')
+        self.assertEqual(next_free_slug(JewelryItem, 'twist-band', exclude_pk=third.pk), 'twist-band-2')
+
+    def test_batch_allocation(self):
+        self.item('Twist Band').save()
+        slugs = allocate_slugs(JewelryItem, ['Twist Band', 'Twist Band', 'Plain Hoop', '!!!'],
+                               batch_size=1, reserved=['plain-hoop'])
+        self.assertEqual(slugs, ['twist-band-1', 'twist-band-2', 'plain-hoop-1', 'item'])
+
+    def test_retries_after_losing_a_race(self):
+        self.item('Twist Band').save()
+        item = self.item('Twist Band')
+        lookups = []
+
+        def lookup(*args, **kwargs):
+            lookups.append(args)
+            # The first lookup ran before the concurrent insert committed and saw the base free
+            return 'twist-band' if len(lookups) == 1 else next_free_slug(*args, **kwargs)
+
+        with mock.patch('api.slugs.next_free_slug', lookup):
+            item.save()
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(JewelryItem.objects.get(pk=item.pk).slug, 'twist-band-1')
+
+    def test_other_integrity_errors_are_not_retried(self):
+        save = mock.Mock(side_effect=IntegrityError('price'))
+        with self.assertRaises(IntegrityError):
+            save_with_unique_slug(self.item('Twist Band'), save)
+        self.assertEqual(save.call_count, 1)
+
+    def test_duplicate_category_and_subcategory_slugs(self):
+        with self.assertRaisesMessage(ModelValidationError, "slug 'rings' already exists"):
+            Category.objects.create(name='Rings!')
+        with self.assertRaisesMessage(ModelValidationError, "slug 'gold-rings' already exists"):
+            Subcategory.objects.create(name='Gold Rings!', category=self.category)
+
+    def test_slug_routes(self):
+        routes = [
+            ('/api/categories/slug/', self.category),
+            ('/api/subcategories/slug/', self.subcategory),
+            ('/api/products/slug/', self.items[0]),
+        ]
+        for prefix, instance in routes:
+            response = self.client.get(f'{prefix}{instance.slug}/')
+            self.assertEqual((response.status_code, response.json()['id']), (200, str(instance.id)))
+            self.assertEqual(self.client.get(f'{prefix}missing/').status_code, 404)
+
+
+class CatalogImportExportTests(CatalogFixtureMixin, TestCase):
+    """
+    catalog_export output imports back unchanged; bad rows are reported by line and skipped
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        JewelryItem.objects.create(
+            name='Retired Pendant', description='Hand engraved, "vintage"', price=Decimal('80.00'),
+            weight=None, category=cls.category, subcategory=cls.subcategory, is_active=False,
+        )
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def rows(self):
+        return list(JewelryItem.objects.order_by('slug').values_list(
+            'slug', 'name', 'description', 'price', 'category__name', 'subcategory__name',
+            'weight', 'image_url', 'is_active',
+        ))
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('catalog_import', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+        return path
+
+    def test_round_trip(self):
+        expected = self.rows()
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                path = os.path.join(self.directory, f'catalog.{fmt}')
+                call_command('catalog_export', path, stderr=StringIO())
+                JewelryItem.objects.all().delete()
+                Subcategory.objects.all().delete()
+                Category.objects.all().delete()
+
+                stdout, stderr = self.run_import(path, '--create-missing', '--batch-size', '2')
+                self.assertIn(f'upserted {len(expected)}, rejected 0', stdout)
+                self.assertEqual(stderr, '')
+                self.assertEqual(self.rows(), expected)
+
+    def test_bad_rows_are_rejected_by_line(self):
+        path = self.write('catalog.csv', (
+            'slug,name,description,price,category,subcategory,weight,image_url,is_active\n'
+            'ring-0,Ring 0 Renamed,,150.00,Rings,Gold Rings,2.50,,true\n'
+            'bad-price,Bad Price,,-5,Rings,Gold Rings,,,true\n'
+            'new-band,New Band,,75.00,Rings,Gold Rings,,,yes\n'
+            'no-category,No Category,,75.00,Bracelets,Cuffs,,,true\n'
+            'bad-flag,Bad Flag,,75.00,Rings,Gold Rings,,,maybe\n'
+        ))
+        stdout, stderr = self.run_import(path)
+        self.assertIn('Read 5 rows, upserted 2, rejected 3', stdout)
+        self.assertEqual(stderr.splitlines(), [
+            'line 3: Price must be a positive number.',
+            "line 5: Unknown category 'Bracelets'",
+            "line 6: is_active must be true or false, got 'maybe'",
+        ])
+        self.assertEqual(JewelryItem.objects.get(slug='ring-0').price, Decimal('150.00'))
+        self.assertTrue(JewelryItem.objects.filter(slug='new-band').exists())
+        self.assertFalse(JewelryItem.objects.filter(slug__in=['bad-price', 'no-category', 'bad-flag']).exists())
+
+    def test_invalid_json_line(self):
+        path = self.write('catalog.jsonl', (
+            '{"name": "New Band", "price": "75.00", "category": "rings", "subcategory": "gold-rings"}\n'
+            '{"name": "Broken"\n'
+            '["not", "an", "object"]\n'
+        ))
+        stdout, stderr = self.run_import(path, '--max-errors', '1')
+        self.assertIn('upserted 1, rejected 2', stdout)
+        self.assertEqual(len(stderr.splitlines()), 1)
+        self.assertTrue(stderr.startswith('line 2: Invalid JSON'))
+        self.assertTrue(JewelryItem.objects.filter(slug='new-band').exists())
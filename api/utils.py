@@ -13,7 +13,7 @@ def send_order_confirmation_email(order):
     user = order.user
     name = user.name
     email = user.email
-    order_items = OrderItem.objects.filter(order=order)
+    order_items = OrderItem.objects.filter(order=order).select_related('jewelry_item')
     created_at = localtime(order.created_at)
 
     html_message = render_to_string('email/order_confirmation.html', {
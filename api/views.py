@@ -1,4 +1,6 @@
-from django.shortcuts import render
+from django.http import StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -9,7 +11,22 @@ from .serializers import CategorySerializer, SubcategorySerializer, JewelryItemS
 from .permissions import IsOwner, IsCustomer
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
 from .utils import send_order_confirmation_email
+from .pagination import KeysetPagination
+from .filters import filter_jewelry_items, get_jewelry_item_ordering, parse_uuid_list, parse_uuid_param
+from .search import search_jewelry_items
+from .caching import CachedReadMixin
+from .bulk import BulkError, run_bulk_operations
+from .cart_store import get_cart_store
+from .carts import parse_quantities
+from .changes import DEFAULT_LIMIT, MAX_LIMIT, change_feed
+from .fastpath import ValuesListMixin
+from .fieldsets import SparseFieldsetMixin
+from rest_framework.utils.urls import replace_query_param
 User = get_user_model()
 
 @api_view(['GET'])
@@ -44,8 +61,18 @@ def public_view(request):
         'status': 'success'
     })
 
+def profile_etag(request):
+    user = request.user
+    return f'{user.pk}:{user.updated_at.timestamp()}'
+
+
+def profile_last_modified(request):
+    return request.user.updated_at
+
+
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
 def user_profile(request):
     """
     Get or update user profile
@@ -124,18 +151,81 @@ def user_stats(request):
         }
     })
 
+class SlugLookupMixin:
+    """
+    Adds a /<resource>/slug/<slug>/ route that retrieves an object by slug
+    """
+
+    @action(detail=False, methods=['GET'], url_path=r'slug/(?P<slug>[-\w]+)')
+    def by_slug(self, request, slug=None):
+        """
+        Get a single object by its slug
+        """
+        return self.cached_response(self._retrieve_by_slug, request, slug=slug)
+
+    def _retrieve_by_slug(self, request, slug=None):
+        instance = get_object_or_404(self.get_queryset(), slug=slug)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
 # Category
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SlugLookupMixin, CachedReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_models = (Category,)
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'by_slug', 'tree']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [IsOwner]
         return [permission() for permission in permission_classes]
+
+    def get_cache_models(self):
+        if self.action == 'tree':
+            return (Category, Subcategory, JewelryItem)
+        return super().get_cache_models()
+
+    @action(detail=False, methods=['GET'])
+    def tree(self, request):
+        """
+        Categories with their subcategories and active item counts, for the navigation menu
+        """
+        return self.cached_response(self._build_tree, request)
+
+    def _build_tree(self, request):
+        # One grouped LEFT JOIN: a row per (category, subcategory) pair
+        rows = Category.objects.order_by('name', 'subcategories__name').values(
+            'id', 'name', 'slug',
+            'subcategories__id', 'subcategories__name', 'subcategories__slug',
+        ).annotate(
+            active_items=Count(
+                'subcategories__jewelry_items',
+                filter=Q(subcategories__jewelry_items__is_active=True),
+            )
+        )
+
+        tree = {}
+        for row in rows:
+            node = tree.get(row['id'])
+            if node is None:
+                node = tree[row['id']] = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'slug': row['slug'],
+                    'active_items': 0,
+                    'subcategories': [],
+                }
+            if row['subcategories__id'] is not None:
+                node['subcategories'].append({
+                    'id': row['subcategories__id'],
+                    'name': row['subcategories__name'],
+                    'slug': row['subcategories__slug'],
+                    'active_items': row['active_items'],
+                })
+                node['active_items'] += row['active_items']
+        return Response(list(tree.values()))
     
     @action(detail=True, methods=['GET'])
     def get_subcategories_by_category(self, request, pk=None):
@@ -143,18 +233,20 @@ class CategoryViewSet(viewsets.ModelViewSet):
         Get all subcategories for a specific category
         """
         category = self.get_object()
-        subcategories = category.subcategories.all()
+        # Evaluate once; the serializer reuses the fetched rows
+        subcategories = list(category.subcategories.all())
         if not subcategories:
             return Response({'message': 'No subcategories found for this category'}, status=404)
         serializer = SubcategorySerializer(subcategories, many=True)
         return Response(serializer.data)
     
-class SubcategoryViewSet(viewsets.ModelViewSet):
+class SubcategoryViewSet(SlugLookupMixin, CachedReadMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Subcategory.objects.all()
     serializer_class = SubcategorySerializer
+    cache_models = (Subcategory,)
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'by_slug']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [IsOwner]
@@ -166,41 +258,165 @@ class SubcategoryViewSet(viewsets.ModelViewSet):
         Get all jewelry items for a specific subcategory
         """
         subcategory = self.get_object()
-        jewelry_items = subcategory.jewelry_items.all()
+        # Evaluate once; the serializer reuses the fetched rows
+        jewelry_items = list(subcategory.jewelry_items.all())
         if not jewelry_items:
             return Response({'message': 'No jewelry items found for this subcategory'}, status=404)
         serializer = JewelryItemSerializer(jewelry_items, many=True)
         return Response(serializer.data)
     
-class JewelryItemViewSet(viewsets.ModelViewSet):
+class JewelryItemViewSet(SlugLookupMixin, CachedReadMixin, ValuesListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = JewelryItem.objects.all()
     serializer_class = JewelryItemSerializer
+    pagination_class = KeysetPagination
+    cache_models = (JewelryItem,)
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'by_slug', 'search', 'changes', 'get_reviews', 'ratings']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [IsOwner]
         return [permission() for permission in permission_classes]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filter_jewelry_items(queryset, self.request.query_params)
+        return queryset
+
+    @property
+    def keyset_ordering(self):
+        return get_jewelry_item_ordering(self.request.query_params)
+
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        """
+        Full-text search over active items, ranked by relevance
+
+        Query parameters: q (required), category, subcategory, page, page_size
+        """
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query (q) is required'}, status=400)
+
+        category = parse_uuid_param(params, 'category')
+        subcategory = parse_uuid_param(params, 'subcategory')
+        paginator = KeysetPagination()
+        page_size = paginator.get_page_size(request)
+        try:
+            page = max(int(params.get('page', 1)), 1)
+        except ValueError:
+            return Response({'error': 'Page must be an integer'}, status=400)
+
+        # One extra row tells us whether there is a next page
+        items = search_jewelry_items(query, category, subcategory,
+                                     offset=(page - 1) * page_size, limit=page_size + 1)
+        url = request.build_absolute_uri()
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if len(items) > page_size else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': JewelryItemSerializer(items[:page_size], many=True).data,
+        })
     
+    @action(detail=False, methods=['GET'])
+    def changes(self, request):
+        """
+        NDJSON feed of items changed or deleted since the ?since= cursor
+
+        Query parameters: since (cursor from the previous response's last
+        line; omit for a full sync), limit
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Limit must be an integer'}, status=400)
+        if limit <= 0:
+            return Response({'error': 'Limit must be positive'}, status=400)
+        lines = change_feed(JewelryItemSerializer(), request.query_params.get('since'), limit)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request):
+        """
+        Create, update and delete many items in one transaction
+
+        Body: {"operations": [{"op": "create"|"update"|"delete", "id": ..., "data": {...}}]}
+        """
+        operations = request.data.get('operations') if hasattr(request.data, 'get') else None
+        try:
+            results = run_bulk_operations(operations)
+        except BulkError as exc:
+            body = {'error': exc.detail}
+            if exc.results is not None:
+                body['results'] = exc.results
+            return Response(body, status=exc.status)
+        return Response({'results': results}, status=200)
+
     @action(detail=True, methods=['GET'])
     def get_reviews(self, request, pk=None):
         """
-        Get all reviews for a specific jewelry item
+        Reviews of a specific jewelry item, newest first
+
+        Query parameters: cursor, page_size
         """
         jewelry_item = self.get_object()
-        reviews = jewelry_item.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        reviews = Review.objects.filter(jewelry_item_id=jewelry_item.pk).select_related('user')
+        # Not self.paginator: its ordering follows the product list's ?ordering=
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(reviews, request)
+        serializer = ReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def ratings(self, request):
+        """
+        Rating summaries for many items at once
 
-class CartViewSet(viewsets.ModelViewSet):
+        Query parameters: ids (comma-separated item IDs, at most 100)
+        """
+        ids = parse_uuid_list(request.query_params.get('ids'))
+        if not ids:
+            return Response({'error': 'ids is required'}, status=400)
+        if len(ids) > 100:
+            return Response({'error': 'At most 100 ids per request'}, status=400)
+
+        # Read from the aggregates kept on the item rather than grouping reviews
+        stars = ['rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+        rows = JewelryItem.objects.filter(pk__in=ids).values('id', 'average_rating', 'rating_count', *stars)
+        summaries = {
+            row['id']: {
+                'id': str(row['id']),
+                'average_rating': round(row['average_rating'], 2),
+                'rating_count': row['rating_count'],
+                'histogram': {star[-1]: row[star] for star in stars},
+            }
+            for row in rows
+        }
+        return Response({'results': [summaries[pk] for pk in dict.fromkeys(ids) if pk in summaries]})
+
+class CartViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsCustomer]
 
     def get_queryset(self):
         user = self.request.user
         # Since each user has exactly one cart, get it directly
-        return Cart.objects.filter(user=user)
+        items = CartItem.objects.select_related('jewelry_item')
+        return Cart.objects.filter(user=user).prefetch_related(Prefetch('items', queryset=items))
+
+    def get_cart(self):
+        return get_cart_store().get_cart(self.request.user, self.filter_queryset(self.get_queryset()))
+
+    def list(self, request, *args, **kwargs):
+        cart = self.get_cart()
+        return Response([] if cart is None else [self.get_serializer(cart).data])
+
+    def retrieve(self, request, *args, **kwargs):
+        cart = self.get_cart()
+        if cart is None or str(cart.pk) != kwargs['pk']:
+            raise NotFound()
+        return Response(self.get_serializer(cart).data)
     
     def perform_create(self, serializer):
         # Cart creation is not allowed since it's automatic
@@ -212,35 +428,73 @@ class CartViewSet(viewsets.ModelViewSet):
         """
         Clear the user's cart
         """
-        user = request.user
-        try:
-            cart = user.cart  # Use the new related name
-            cart.items.all().delete()
-            return Response({'message': 'Cart cleared successfully'}, status=204)
-        except Cart.DoesNotExist:
-            return Response({'message': 'Cart not found'}, status=404)
+        get_cart_store().clear(request.user)
+        return Response({'message': 'Cart cleared successfully'}, status=204)
+
+    @action(detail=False, methods=['GET'])
+    def summary(self, request):
+        """
+        Item count and subtotal of the user's cart
+        """
+        return Response(get_cart_store().summary(request.user))
 
-class CartItemViewSet(viewsets.ModelViewSet):
+class CartItemViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
     permission_classes = [IsCustomer]
 
     def get_queryset(self):
-        return CartItem.objects.filter(cart__user=self.request.user)
+        return CartItem.objects.filter(cart__user=self.request.user).select_related('jewelry_item')
 
-    def perform_create(self, serializer):
-        cart = self.request.user.cart
-        serializer.save(cart=cart)
+    def list(self, request, *args, **kwargs):
+        items = get_cart_store().get_items(request.user, self.filter_queryset(self.get_queryset()))
+        return Response(self.get_serializer(items, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(self._get_item(kwargs['pk'])).data)
+
+    def _get_item(self, pk):
+        item = get_cart_store().get_item(self.request.user, pk, self.filter_queryset(self.get_queryset()))
+        if item is None:
+            raise NotFound()
+        return item
+
+    def update(self, request, *args, **kwargs):
+        # Full edits work on the rows, so bring them up to date first
+        with get_cart_store().persisted(request.user):
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        if not get_cart_store().set_quantity(request.user, kwargs['pk'], 0):
+            raise NotFound()
+        return Response(status=204)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Add a product to the cart, or increase its quantity if it is already there
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        item, = get_cart_store().add(request.user, {data['jewelry_item'].pk: data.get('quantity', 1)})
+        return Response(CartItemSerializer(item).data, status=201)
+
+    @action(detail=False, methods=['POST'])
+    def bulk_add(self, request):
+        """
+        Add many products to the cart in one statement
+
+        Body: {"items": [{"jewelry_item_id": ..., "quantity": ...}]}; repeated
+        products are merged.
+        """
+        entries = request.data.get('items') if hasattr(request.data, 'get') else None
+        items = get_cart_store().add(request.user, parse_quantities(entries))
+        return Response({'results': CartItemSerializer(items, many=True).data}, status=200)
 
     @action(detail=True, methods=['PATCH'])
     def update_quantity(self, request, pk=None):
         """
         Update quantity of a specific cart item
         """
-        try:
-            item = self.get_object()
-        except CartItem.DoesNotExist:
-            return Response({'error': 'Cart item not found'}, status=404)
-        
         quantity = request.data.get('quantity')
         if quantity is None:
             return Response({'error': 'Quantity is required'}, status=400)
@@ -250,17 +504,16 @@ class CartItemViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'error': 'Quantity must be an integer'}, status=400)
 
+        if not get_cart_store().set_quantity(request.user, pk, quantity):
+            return Response({'error': 'Cart item not found'}, status=404)
         if quantity <= 0:
-            item.delete()
             return Response({'message': 'Item removed as quantity was set to 0'}, status=204)
-
-        item.quantity = quantity
-        item.save()
-        return Response(CartItemSerializer(item).data)
+        return Response(CartItemSerializer(self._get_item(pk)).data)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         if self.action =='create':
@@ -270,45 +523,50 @@ class OrderViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
+        items = Prefetch('items', queryset=OrderItem.objects.select_related('jewelry_item'))
         if self.request.user.role == 'owner':
-            return Order.objects.all()
+            return Order.objects.prefetch_related(items)
         else:
-            return Order.objects.filter(user=self.request.user)
+            return Order.objects.filter(user=self.request.user).prefetch_related(items)
     
     def perform_create(self, serializer):
         """
         Create order and automatically create order items from user's cart
         """
-        user = self.request.user
-        
-        # Get user's cart
-        cart = Cart.objects.filter(user=user).first()
-        if not cart or not cart.items.exists():
-            from rest_framework.exceptions import ValidationError
-            raise ValidationError("Cannot create order: Cart is empty")
-        
-        # Calculate total amount from cart items
-        total_amount = sum(
-            item.quantity * item.jewelry_item.price 
-            for item in cart.items.all()
-        )
-        
-        # Create the order
-        order = serializer.save(user=user, total_amount=total_amount)
-        
-        # Create order items from cart items
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                jewelry_item=cart_item.jewelry_item,
-                quantity=cart_item.quantity
-            )
-        
-        # Clear the cart after successful order creation
-        cart.items.all().delete()
+        # Orders are built from the cart rows; a cached cart is written back first
+        with get_cart_store().persisted(self.request.user):
+            self._create_order(serializer)
 
-        # Send order confirmation email
-        send_order_confirmation_email(order)
+    def _create_order(self, serializer):
+        user = self.request.user
+        with transaction.atomic():
+            # Lock the cart and its lines so concurrent adds and checkouts wait
+            cart_id = Cart.objects.select_for_update().filter(user=user).values_list('id', flat=True).first()
+            lines = CartItem.objects.filter(cart_id=cart_id)
+            locked = list(lines.select_for_update(of=('self',)).values_list(
+                'jewelry_item_id', 'quantity', 'jewelry_item__price'))
+            if not locked:
+                from rest_framework.exceptions import ValidationError
+                raise ValidationError("Cannot create order: Cart is empty")
+
+            # Total from the same rows as the snapshots, so a reprice committing
+            # mid-checkout can't make the order disagree with its lines
+            total_amount = sum((quantity * price for _, quantity, price in locked), Decimal('0'))
+            order = serializer.save(user=user, total_amount=total_amount.quantize(Decimal('0.01')))
+
+            # Each line keeps the price it was sold at
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, jewelry_item_id=jewelry_item_id, quantity=quantity, unit_price=price)
+                for jewelry_item_id, quantity, price in locked
+            ])
+            lines.delete()
+
+            # The response lists the items; load their products in one query
+            items = OrderItem.objects.select_related('jewelry_item')
+            prefetch_related_objects([order], Prefetch('items', queryset=items))
+
+            # Only email once the order is committed
+            transaction.on_commit(lambda: send_order_confirmation_email(order))
 
 
     @action(detail=True, methods=['PUT'])
@@ -328,9 +586,13 @@ class OrderViewSet(viewsets.ModelViewSet):
         order.save()
         return Response({'message': 'Order cancelled successfully'}, status=200)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ValuesListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     queryset = Review.objects.all()
+    pagination_class = KeysetPagination
+    # ReviewSerializer.user is a StringRelatedField and User.__str__ is the email
+    values_overrides = {'user': 'user__email'}
+
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [permissions.AllowAny]
@@ -342,18 +604,21 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     def get_queryset(self):
-        product_id = self.request.query_params.get('product_id', None)
+        # ReviewSerializer.user renders the author; fetch it in the same query
+        queryset = Review.objects.select_related('user')
+        product_id = parse_uuid_param(self.request.query_params, 'product_id')
         if product_id is not None:
-            return Review.objects.filter(jewelry_item__id=product_id)
-        return Review.objects.all()
+            return queryset.filter(jewelry_item_id=product_id)
+        return queryset
 
-class AdminOrderViewSet(viewsets.ModelViewSet):
+class AdminOrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Admin viewset for managing all orders
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsOwner]
+    pagination_class = KeysetPagination
 
     @action(detail=True, methods=['PUT'])
     def update_status(self, request, pk=None):
@@ -372,12 +637,14 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
         return Response({'message': f'Order status updated to {new_status}'}, status=200)
 
 
-class NoticesViewSet(viewsets.ModelViewSet):
+class NoticesViewSet(CachedReadMixin, ValuesListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Viewset for managing notices
     """
     queryset = Notices.objects.all()
     serializer_class = NoticesSerializer
+    pagination_class = KeysetPagination
+    cache_models = (Notices,)
     # permission_classes = [IsOwner]
 
     def perform_create(self, serializer):
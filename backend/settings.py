@@ -58,7 +58,7 @@ INSTALLED_APPS = [
     # 'python-jose',
     'api',
     'accounts',
-    # 'gold'
+    'gold',
 ]
 
 MIDDLEWARE = [
@@ -110,6 +110,27 @@ DATABASES = {
 }
 
 
+# Cache
+# The catalog response cache (api.caching) is only coherent across workers
+# when this backend is shared, e.g. CACHE_BACKEND=
+# django.core.cache.backends.redis.RedisCache with CACHE_LOCATION=redis://...
+# With the per-process LocMemCache default no responses are stored, so the
+# precompressed gzip/br variants are off too; the catalog views still answer
+# conditional GETs from a database fingerprint. br also needs Brotli installed.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Cart storage (api.cart_store): 'database' reads and writes cart rows
+# directly; 'cache' keeps carts in the cache above and writes them back
+# every CART_FLUSH_INTERVAL seconds, and before checkout. 'cache' needs a
+# shared CACHE_BACKEND; the api.E001 check fails startup without one.
+CART_STORE = os.getenv('CART_STORE', 'database')
+CART_FLUSH_INTERVAL = float(os.getenv('CART_FLUSH_INTERVAL', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -201,4 +222,20 @@ JWT_SETTINGS = {
     'AUDIENCE': AUTH0_AUDIENCE,
     'ISSUER': AUTH0_ISSUER,
     'JWKS_URL': f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
+    # Optional pinned JWKS file used to seed keys before the first fetch
+    'JWKS_FILE': os.getenv('AUTH0_JWKS_FILE'),
+    # Keys are refreshed in the background after JWKS_CACHE_TTL seconds and
+    # synchronously once older than JWKS_MAX_STALE seconds
+    'JWKS_CACHE_TTL': int(os.getenv('AUTH0_JWKS_CACHE_TTL', '3600')),
+    'JWKS_MAX_STALE': int(os.getenv('AUTH0_JWKS_MAX_STALE', '86400')),
+    # Signature verification backend: 'auto', 'cryptography' or 'python-rsa'
+    'VERIFY_BACKEND': os.getenv('JWT_VERIFY_BACKEND', 'auto'),
+    # Max number of verified token payloads kept in memory per process
+    'TOKEN_CACHE_SIZE': int(os.getenv('JWT_TOKEN_CACHE_SIZE', '1024')),
+    # Resolved users cached per process, keyed by Auth0 sub; hits are checked
+    # against a per-user version so writes on any worker take effect at once
+    'USER_CACHE_SIZE': int(os.getenv('AUTH_USER_CACHE_SIZE', '1024')),
+    'USER_CACHE_TTL': int(os.getenv('AUTH_USER_CACHE_TTL', '60')),
+    # Seconds profile claim changes are coalesced before being written
+    'PROFILE_SYNC_INTERVAL': float(os.getenv('AUTH_PROFILE_SYNC_INTERVAL', '2')),
 }
@@ -0,0 +1,42 @@
+from django.contrib import admin, messages
+
+from .models import GoldRate, MakingCharge
+from .pricing import is_current, reprice_catalog, reprice_if_current
+
+
+@admin.register(GoldRate)
+class GoldRateAdmin(admin.ModelAdmin):
+    list_display = ('rate_per_gram', 'effective_at', 'source', 'applied_at', 'items_repriced')
+    list_filter = ('source',)
+    readonly_fields = ('applied_at', 'items_repriced')
+    ordering = ('-effective_at',)
+    actions = ['reprice']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            count = reprice_if_current(obj)
+            if count is None:
+                self.message_user(request, 'Prices unchanged: this rate is not the one in effect now.', messages.WARNING)
+            else:
+                self.message_user(request, f'Repriced {count} items at {obj.rate_per_gram} per gram.')
+
+    @admin.action(description='Reprice the catalog at the selected rate')
+    def reprice(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one rate.', messages.ERROR)
+            return
+        gold_rate = queryset.get()
+        if not is_current(gold_rate):
+            self.message_user(request, 'Only the rate in effect now can be applied.', messages.ERROR)
+            return
+        count = reprice_catalog(gold_rate)
+        self.message_user(request, f'Repriced {count} items at {gold_rate.rate_per_gram} per gram.')
+
+
+@admin.register(MakingCharge)
+class MakingChargeAdmin(admin.ModelAdmin):
+    list_display = ('subcategory', 'per_gram', 'fixed', 'updated_at')
+    list_editable = ('per_gram', 'fixed')
+    search_fields = ('subcategory__name',)
+    list_filter = ('subcategory__category',)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from gold.pricing import current_rate, reprice_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Reprice the catalog at the gold rate in effect now if it has not been '
+        'applied yet. Run it periodically so rates recorded with a future '
+        'effective_at take effect once due.'
+    )
+
+    def handle(self, *args, **options):
+        gold_rate = current_rate()
+        if gold_rate is None:
+            self.stdout.write('No gold rate is in effect')
+            return
+        if gold_rate.applied_at is not None:
+            self.stdout.write(f'Gold rate {gold_rate.rate_per_gram} per gram is already applied')
+            return
+        count = reprice_catalog(gold_rate)
+        self.stdout.write(self.style.SUCCESS(f'Repriced {count} items at {gold_rate.rate_per_gram} per gram'))
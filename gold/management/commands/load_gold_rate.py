@@ -0,0 +1,77 @@
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from gold.models import GoldRate
+from gold.pricing import is_current, reprice_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Record the gold rate from a rate file and reprice the catalog. '
+        'The file holds either a bare number (the rate per gram) or a JSON '
+        'object with "rate_per_gram" and optionally "effective_at". Prices '
+        'only change if the rate is the one in effect now; a future rate is '
+        'applied later by apply_gold_rate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Rate file')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many items would change without saving anything')
+        parser.add_argument('--no-reprice', action='store_true',
+                            help='Only record the rate')
+
+    def handle(self, *args, **options):
+        rate, effective_at = self._read(options['path'])
+        gold_rate = GoldRate(rate_per_gram=rate, source='file')
+        if effective_at is not None:
+            gold_rate.effective_at = effective_at
+
+        if options['dry_run']:
+            if not is_current(gold_rate):
+                self.stdout.write('Rate is not in effect now; no items would be repriced')
+                return
+            count = reprice_catalog(gold_rate, dry_run=True)
+            self.stdout.write(f'{count} items would be repriced at {rate} per gram')
+            return
+
+        gold_rate.full_clean()
+        gold_rate.save()
+        if options['no_reprice'] or not is_current(gold_rate):
+            self.stdout.write(f'Recorded gold rate {rate} per gram from {gold_rate.effective_at:%Y-%m-%d %H:%M}')
+            return
+        start = time.perf_counter()
+        count = reprice_catalog(gold_rate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Repriced {count} items at {rate} per gram in {time.perf_counter() - start:.2f}s'
+        ))
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read().strip()
+        except OSError as exc:
+            raise CommandError(exc)
+
+        effective_at = None
+        if text.startswith('{'):
+            try:
+                payload = json.loads(text)
+                text = str(payload['rate_per_gram'])
+            except (ValueError, KeyError):
+                raise CommandError('Rate file must contain a JSON object with "rate_per_gram"')
+            if payload.get('effective_at'):
+                effective_at = parse_datetime(payload['effective_at'])
+                if effective_at is None:
+                    raise CommandError(f"Invalid effective_at '{payload['effective_at']}'")
+        try:
+            rate = Decimal(text)
+        except InvalidOperation:
+            raise CommandError(f"Invalid rate '{text}'")
+        if not rate.is_finite() or rate <= 0:
+            raise CommandError('Rate must be a positive number')
+        return rate, effective_at
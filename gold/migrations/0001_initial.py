@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:54
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('api', '0012_jewelryitem_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoldRate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('rate_per_gram', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('effective_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(choices=[('admin', 'Admin'), ('file', 'Rate file'), ('api', 'API')], default='admin', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('items_repriced', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-effective_at', '-created_at'],
+                'get_latest_by': ['effective_at', 'created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MakingCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('per_gram', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('fixed', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subcategory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='making_charge', to='api.subcategory')),
+            ],
+            options={
+                'ordering': ['subcategory__name'],
+            },
+        ),
+    ]
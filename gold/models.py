@@ -0,0 +1,51 @@
+import uuid
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
+from django.db import models
+from django.utils import timezone
+
+from api.models import Subcategory
+
+
+class GoldRate(models.Model):
+    """
+    Price of gold per gram from a given moment on
+    """
+    SOURCE_CHOICES = [
+        ('admin', 'Admin'),
+        ('file', 'Rate file'),
+        ('api', 'API'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    rate_per_gram = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    effective_at = models.DateTimeField(default=timezone.now)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='admin')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the catalog has been repriced at this rate
+    applied_at = models.DateTimeField(blank=True, null=True)
+    items_repriced = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-effective_at', '-created_at']
+        get_latest_by = ['effective_at', 'created_at']
+
+    def __str__(self):
+        return f'{self.rate_per_gram}/g from {self.effective_at:%Y-%m-%d %H:%M}'
+
+
+class MakingCharge(models.Model):
+    """
+    Labour added on top of the metal value for items in a subcategory
+    """
+    subcategory = models.OneToOneField(Subcategory, related_name='making_charge', on_delete=models.CASCADE)
+    per_gram = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    fixed = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['subcategory__name']
+
+    def __str__(self):
+        return f'{self.subcategory}: {self.per_gram}/g + {self.fixed}'
@@ -0,0 +1,113 @@
+"""
+Catalog repricing from the gold rate.
+
+An item's price is its metal value plus its subcategory's making charge::
+
+    price = weight * (rate_per_gram + per_gram) + fixed
+
+rounded to two places. Only items with a weight whose subcategory has a
+MakingCharge are priced this way; everything else keeps its hand-set
+price. The whole catalog is repriced with a single UPDATE, the charges
+coming from correlated subqueries, so the cost is one statement rather
+than a save() per item.
+
+A rate only moves prices while it is the one in effect: the latest whose
+``effective_at`` has passed. Backdated rates that a later one supersedes
+are kept for the history, and rates dated in the future wait for the
+``apply_gold_rate`` command to run once they are due.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Now, Round
+from django.utils import timezone
+
+from api.caching import bump_generation
+from api.models import JewelryItem, Notices
+
+from .models import GoldRate, MakingCharge
+
+PRICE_FIELD = JewelryItem._meta.get_field('price')
+
+
+def price_expression(rate_per_gram):
+    """
+    Database expression for an item's price at ``rate_per_gram``
+    """
+    charges = MakingCharge.objects.filter(subcategory_id=OuterRef('subcategory_id')).order_by()
+    per_gram = Subquery(charges.values('per_gram')[:1])
+    fixed = Subquery(charges.values('fixed')[:1])
+    rate = Value(Decimal(rate_per_gram), output_field=DecimalField(max_digits=10, decimal_places=2))
+    return Round(
+        F('weight') * (rate + per_gram) + fixed,
+        PRICE_FIELD.decimal_places,
+        output_field=DecimalField(max_digits=PRICE_FIELD.max_digits, decimal_places=PRICE_FIELD.decimal_places),
+    )
+
+
+def priced_items():
+    """
+    Items whose price follows the gold rate
+    """
+    return JewelryItem.objects.filter(weight__gt=0, subcategory__making_charge__isnull=False)
+
+
+def current_rate(now=None):
+    """
+    The rate in effect at ``now``, or None
+    """
+    return GoldRate.objects.filter(effective_at__lte=now or timezone.now()).first()
+
+
+def is_current(gold_rate, now=None):
+    """
+    Whether ``gold_rate`` is the rate in effect at ``now``
+
+    An unsaved rate is judged as if it were saved now, so it wins a tie on
+    effective_at against rates already recorded.
+    """
+    now = now or timezone.now()
+    if gold_rate.effective_at > now:
+        return False
+    later = Q(effective_at__gt=gold_rate.effective_at)
+    if gold_rate.created_at is not None:
+        later |= Q(effective_at=gold_rate.effective_at, created_at__gt=gold_rate.created_at)
+    return not GoldRate.objects.filter(later, effective_at__lte=now).exclude(pk=gold_rate.pk).exists()
+
+
+def reprice_if_current(gold_rate):
+    """
+    Reprice at ``gold_rate`` if it is in effect now; return the count, or None
+    """
+    if not is_current(gold_rate):
+        return None
+    return reprice_catalog(gold_rate)
+
+
+def reprice_catalog(gold_rate, dry_run=False):
+    """
+    Reprice every gold-priced item at ``gold_rate``; return how many changed
+
+    Runs in one transaction and, when anything changed, posts a
+    'price change' notice.
+    """
+    new_price = price_expression(gold_rate.rate_per_gram)
+    stale = priced_items().filter(~Q(price=new_price))
+    if dry_run:
+        return stale.count()
+
+    with transaction.atomic():
+        updated = stale.update(price=new_price, updated_at=Now())
+        gold_rate.applied_at = timezone.now()
+        gold_rate.items_repriced = updated
+        gold_rate.save(update_fields=['applied_at', 'items_repriced'])
+        if updated:
+            Notices.objects.create(
+                notice_type='price change',
+                message=(f'Prices of {updated} products have been updated '
+                         f'for a gold rate of {gold_rate.rate_per_gram} per gram.'),
+            )
+            # QuerySet.update() sends no signals
+            transaction.on_commit(lambda: bump_generation(JewelryItem))
+    return updated
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from .models import GoldRate, MakingCharge
+
+
+class GoldRateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GoldRate
+        fields = ['id', 'rate_per_gram', 'effective_at', 'source', 'created_at', 'applied_at', 'items_repriced']
+        read_only_fields = ['source', 'created_at', 'applied_at', 'items_repriced']
+
+
+class MakingChargeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MakingCharge
+        fields = ['id', 'subcategory', 'per_gram', 'fixed', 'updated_at']
+        read_only_fields = ['updated_at']
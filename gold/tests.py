@@ -0,0 +1,118 @@
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Category, Subcategory, JewelryItem, Notices
+
+from .models import GoldRate, MakingCharge
+from .pricing import current_rate, reprice_catalog
+
+
+class GoldPricingFixtureMixin:
+    """
+    One subcategory priced from the gold rate and one with hand-set prices
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Rings')
+        gold = Subcategory.objects.create(name='Gold Rings', category=category)
+        plain = Subcategory.objects.create(name='Silver Rings', category=category)
+        MakingCharge.objects.create(subcategory=gold, per_gram=Decimal('10.00'), fixed=Decimal('50.00'))
+
+        def item(name, subcategory, weight):
+            return JewelryItem.objects.create(
+                name=name, price=Decimal('100.00'), weight=weight, category=category, subcategory=subcategory,
+            )
+
+        cls.heavy = item('Heavy', gold, Decimal('2.50'))
+        cls.light = item('Light', gold, Decimal('1.25'))
+        cls.weightless = item('Weightless', gold, Decimal('0'))
+        cls.plain = item('Plain', plain, Decimal('3.00'))
+        cls.owner = get_user_model().objects.create(email='owner@example.com', role='owner')
+
+    def price(self, item):
+        return JewelryItem.objects.values_list('price', flat=True).get(pk=item.pk)
+
+
+class RepriceCatalogTests(GoldPricingFixtureMixin, TestCase):
+    """
+    The catalog is repriced by one UPDATE over the gold-priced items
+    """
+
+    def test_single_update(self):
+        gold_rate = GoldRate.objects.create(rate_per_gram=Decimal('100.00'))
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reprice_catalog(gold_rate), 2)
+        updates = [q['sql'] for q in queries if q['sql'].startswith(f'UPDATE "{JewelryItem._meta.db_table}"')]
+        self.assertEqual(len(updates), 1)
+
+        # weight * (rate + per_gram) + fixed
+        self.assertEqual(self.price(self.heavy), Decimal('325.00'))
+        self.assertEqual(self.price(self.light), Decimal('187.50'))
+        self.assertEqual(self.price(self.weightless), Decimal('100.00'))
+        self.assertEqual(self.price(self.plain), Decimal('100.00'))
+
+        gold_rate.refresh_from_db()
+        self.assertEqual(gold_rate.items_repriced, 2)
+        self.assertIsNotNone(gold_rate.applied_at)
+        self.assertEqual(Notices.objects.filter(notice_type='price change').count(), 1)
+
+    def test_unchanged_prices_are_not_rewritten(self):
+        gold_rate = GoldRate.objects.create(rate_per_gram=Decimal('100.00'))
+        reprice_catalog(gold_rate)
+        self.assertEqual(reprice_catalog(gold_rate, dry_run=True), 0)
+        self.assertEqual(reprice_catalog(gold_rate), 0)
+        self.assertEqual(Notices.objects.count(), 1)
+
+
+class EffectiveAtTests(GoldPricingFixtureMixin, TestCase):
+    """
+    Only the latest rate whose effective_at has passed moves prices
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.now = timezone.now()
+        self.rate = GoldRate.objects.create(rate_per_gram=Decimal('100.00'), effective_at=self.now - timedelta(hours=1))
+        reprice_catalog(self.rate)
+
+    def post_rate(self, rate, effective_at):
+        response = self.client.post('/api/gold/rates/', {'rate_per_gram': rate, 'effective_at': effective_at.isoformat()})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_rate_in_effect_reprices(self):
+        data = self.post_rate('200.00', self.now)
+        self.assertEqual(data['items_repriced'], 2)
+        self.assertEqual(self.price(self.heavy), Decimal('575.00'))
+        self.assertEqual(self.client.get('/api/gold/rates/current/').json()['id'], data['id'])
+
+    def test_future_rate_waits(self):
+        data = self.post_rate('200.00', self.now + timedelta(days=1))
+        self.assertIsNone(data['applied_at'])
+        self.assertEqual(self.price(self.heavy), Decimal('325.00'))
+        self.assertEqual(self.client.get('/api/gold/rates/current/').json()['id'], str(self.rate.pk))
+        response = self.client.post(f"/api/gold/rates/{data['id']}/reprice/", {})
+        self.assertEqual(response.status_code, 400)
+
+        # Once due, apply_gold_rate picks it up
+        GoldRate.objects.filter(pk=data['id']).update(effective_at=self.now - timedelta(minutes=1))
+        call_command('apply_gold_rate', stdout=StringIO())
+        self.assertEqual(self.price(self.heavy), Decimal('575.00'))
+        self.assertIsNotNone(GoldRate.objects.get(pk=data['id']).applied_at)
+
+    def test_superseded_backdated_rate_is_history_only(self):
+        data = self.post_rate('200.00', self.now - timedelta(days=1))
+        self.assertIsNone(data['applied_at'])
+        self.assertEqual(self.price(self.heavy), Decimal('325.00'))
+        self.assertEqual(current_rate(), self.rate)
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+router.register(r'rates', views.GoldRateViewSet, basename='gold-rate')
+router.register(r'making-charges', views.MakingChargeViewSet, basename='making-charge')
+urlpatterns = [
+    path('', include(router.urls)),
+]
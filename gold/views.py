@@ -0,0 +1,62 @@
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from api.permissions import IsOwner
+
+from .models import GoldRate, MakingCharge
+from .pricing import current_rate, is_current, reprice_catalog, reprice_if_current
+from .serializers import GoldRateSerializer, MakingChargeSerializer
+
+
+class GoldRateViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Gold rate history; posting a rate that is in effect now reprices the catalog
+    """
+    queryset = GoldRate.objects.all()
+    serializer_class = GoldRateSerializer
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve', 'current']:
+            permission_classes = [permissions.AllowAny]
+        else:
+            permission_classes = [IsOwner]
+        return [permission() for permission in permission_classes]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        gold_rate = serializer.save(source='api')
+        reprice_if_current(gold_rate)
+        return Response(self.get_serializer(gold_rate).data, status=201)
+
+    @action(detail=False, methods=['GET'])
+    def current(self, request):
+        gold_rate = current_rate()
+        if gold_rate is None:
+            return Response({'error': 'No gold rate has been set'}, status=404)
+        return Response(self.get_serializer(gold_rate).data)
+
+    @action(detail=True, methods=['POST'])
+    def reprice(self, request, pk=None):
+        """
+        Reprice the catalog at this rate again, e.g. after changing making charges
+
+        Pass {"dry_run": true} to only count the items that would change.
+        Only the rate in effect now can be applied.
+        """
+        gold_rate = self.get_object()
+        dry_run = bool(request.data.get('dry_run'))
+        if not dry_run and not is_current(gold_rate):
+            return Response({'error': 'Only the gold rate in effect can be applied'}, status=400)
+        count = reprice_catalog(gold_rate, dry_run=dry_run)
+        return Response({'dry_run': dry_run, 'items_repriced': count})
+
+
+class MakingChargeViewSet(viewsets.ModelViewSet):
+    """
+    Per-subcategory making charges, owner only
+    """
+    queryset = MakingCharge.objects.select_related('subcategory')
+    serializer_class = MakingChargeSerializer
+    permission_classes = [IsOwner]
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 """
 Script to populate the jewelry store with sample data
+
+For real catalogs use ``python manage.py catalog_import``.
 """
 import os
 import sys
 import django
 
 # Setup Django environment
-sys.path.append('/home/kisuke/Desktop/project/Full_Stack/Backend')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 